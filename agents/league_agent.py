@@ -0,0 +1,29 @@
+import random
+
+from agents.rl_agent import RLModelAgent
+from agents.value_agent import ValueAgent
+from env import Player
+from league import OpponentPool
+
+# opponent drawn from a league pool dir before every game, plays like a value agent until the pool has a snapshot
+class LeagueAgent(Player):
+    def __init__(self, player_num, path=None, seed=None):
+        super().__init__(player_num)
+        if not path:
+            raise Exception('need valid league path')
+
+        self.pool = OpponentPool(path)
+        self.rng = random.Random(seed)
+        self.fallback = ValueAgent(player_num)
+        self.agent = self.fallback
+
+    def new_game(self):
+        snapshot = self.pool.sample(self.rng)
+        if snapshot is None:
+            self.agent = self.fallback
+        else:
+            # models come from the process wide registry so a snapshot is only loaded once
+            self.agent = RLModelAgent(self.num, algo=snapshot['algo'], path=snapshot['path'])
+
+    def action(self, info):
+        return self.agent.action(info)
@@ -0,0 +1,143 @@
+import math
+import multiprocessing as mp
+import random
+import time
+
+from env import Player
+
+# node of the information set tree, reached by a sequence of actions no matter how the hidden cards were dealt
+class Node ():
+    __slots__ = ('parent', 'action', 'player', 'children', 'visits', 'available', 'wins')
+
+    def __init__(self, parent=None, action=None, player=None):
+        self.parent = parent
+        self.action = action
+        self.player = player
+        self.children = {}
+        self.visits = 0
+        self.available = 0
+        self.wins = 0
+
+    def ucb(self, exploration):
+        return self.wins / self.visits + exploration * math.sqrt(math.log(self.available) / self.visits)
+
+# fast default policy, random legal actions until the game ends
+def _rollout(state, rng):
+    while not state.is_game_over:
+        state.apply(rng.choice(state.legal_actions()), undoable=False)
+    return state.winner()
+
+def _search(root, state, rng, iterations, time_limit, exploration):
+    deadline = time.perf_counter() + time_limit if time_limit else None
+    i = 0
+    while (iterations is None or i < iterations) and (deadline is None or time.perf_counter() < deadline):
+        i += 1
+        # every iteration plays one possible order of the undealt cards
+        game = state.determinize(rng)
+        node = root
+
+        # select through children legal in this determinization, expand the first untried action
+        while not game.is_game_over:
+            legal = game.legal_actions()
+            untried = [x for x in legal if x not in node.children]
+            for action in legal:
+                if action in node.children:
+                    node.children[action].available += 1
+            player = game.curr_player % game.num_players
+            if untried:
+                action = rng.choice(untried)
+                game.apply(action, undoable=False)
+                child = Node(node, action, player)
+                child.available = 1
+                node.children[action] = child
+                node = child
+                break
+            node = max((node.children[x] for x in legal), key=lambda x : x.ucb(exploration))
+            game.apply(node.action, undoable=False)
+
+        winner = _rollout(game, rng)
+        while node is not None:
+            node.visits += 1
+            if node.player == winner:
+                node.wins += 1
+            node = node.parent
+    return i
+
+def _root_stats(root):
+    return {action: (child.visits, child.wins) for action, child in root.children.items()}
+
+# independent search from the same state in a worker process, only the root statistics come back
+def _parallel_search(args):
+    state, seed, iterations, time_limit, exploration = args
+    root = Node()
+    _search(root, state, random.Random(seed), iterations, time_limit, exploration)
+    return _root_stats(root)
+
+# information set monte carlo tree search agent, needs the info of a ForSale env for its state and action log
+# budget is iterations and/or time_limit seconds per move, num_workers > 1 searches separate trees per process
+# and sums their root visits, the single process tree is kept between moves and reused when the game reaches it
+class MCTSAgent(Player):
+    def __init__(self, player_num, iterations=1000, time_limit=None, exploration=0.7, num_workers=1, seed=None):
+        super().__init__(player_num)
+        if iterations is None and time_limit is None:
+            raise Exception('mcts needs an iteration or time budget')
+
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.num_workers = num_workers
+        self.rng = random.Random(seed)
+        self.root = None
+        self.root_log = None
+        self.pool = None
+
+    def action(self, info):
+        state = info['get_state']()
+        legal = state.legal_actions()
+        if len(legal) == 1:
+            return legal[0]
+
+        if self.num_workers > 1:
+            return self._parallel_action(state)
+
+        root = self._reuse_root(info['action_log'])
+        _search(root, state, self.rng, self.iterations, self.time_limit, self.exploration)
+        action = max(legal, key=lambda x : root.children[x].visits if x in root.children else -1)
+
+        # keep the chosen subtree, the next move continues from it once the opponents' actions are known
+        self.root = root.children.get(action)
+        if self.root is not None:
+            self.root.parent = None
+        self.root_log = list(info['action_log']) + [action]
+        return action
+
+    # follow the actions played since the last search down the old tree, new game or unknown branch starts fresh
+    def _reuse_root(self, action_log):
+        node = self.root
+        if node is None or len(action_log) < len(self.root_log) or action_log[:len(self.root_log)] != self.root_log:
+            return Node()
+
+        for action in action_log[len(self.root_log):]:
+            node = node.children.get(action)
+            if node is None:
+                return Node()
+        node.parent = None
+        return node
+
+    def _parallel_action(self, state):
+        if self.pool is None:
+            self.pool = mp.Pool(self.num_workers)
+
+        iterations = None if self.iterations is None else max(self.iterations // self.num_workers, 1)
+        args = [(state, self.rng.getrandbits(32), iterations, self.time_limit, self.exploration) for _ in range(self.num_workers)]
+        visits = {}
+        for stats in self.pool.map(_parallel_search, args):
+            for action, (n, _) in stats.items():
+                visits[action] = visits.get(action, 0) + n
+        return max(state.legal_actions(), key=lambda x : visits.get(x, -1))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
@@ -1,30 +1,113 @@
+import os
+import time
+from collections import OrderedDict
+
 from sb3_contrib import MaskablePPO
 from stable_baselines3 import DQN, PPO
 
 from env import Player
 
+ALGOS = {
+    'ppo': PPO,
+    'dqn': DQN,
+    'ppo_mask': MaskablePPO
+}
+
+# process wide cache of loaded models keyed by (algo, path, mtime) so a rewritten checkpoint is reloaded
+# least recently used models are evicted once over max_models or max_bytes of policy parameters, None means no cap
+class ModelRegistry ():
+    def __init__(self, max_models=16, max_bytes=None):
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.models = OrderedDict()
+        self.sizes = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_time = 0
+
+    def get(self, algo, path):
+        key = (algo, path, self._get_mtime(path))
+        if key in self.models:
+            self.hits += 1
+            self.models.move_to_end(key)
+            return self.models[key]
+
+        self.misses += 1
+        start = time.perf_counter()
+        model = ALGOS[algo].load(path)
+        self.load_time += time.perf_counter() - start
+
+        self.models[key] = model
+        self.sizes[key] = self._get_size(model)
+        self._evict()
+        return model
+
+    def clear(self):
+        self.models.clear()
+        self.sizes.clear()
+
+    def stats(self):
+        return {
+            'models': len(self.models),
+            'bytes': sum(self.sizes.values()),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'load_time': round(self.load_time, 3)
+        }
+
+    def _evict(self):
+        # newest model always stays even if it alone is over the cap
+        while len(self.models) > 1:
+            over_count = self.max_models is not None and len(self.models) > self.max_models
+            over_bytes = self.max_bytes is not None and sum(self.sizes.values()) > self.max_bytes
+            if not (over_count or over_bytes):
+                break
+            key, _ = self.models.popitem(last=False)
+            del self.sizes[key]
+            self.evictions += 1
+
+    def _get_mtime(self, path):
+        # sb3 adds the .zip extension when it's left off
+        for file_path in (path, path + '.zip'):
+            if os.path.isfile(file_path):
+                return os.path.getmtime(file_path)
+        return None
+
+    def _get_size(self, model):
+        return sum(x.numel() * x.element_size() for x in model.policy.parameters())
+
+model_registry = ModelRegistry()
+
+def load_model(algo, path):
+    if algo not in ALGOS:
+        return None
+    return model_registry.get(algo, path)
+
 # empty agent to stand in for the training network
 class RLTrainingAgent(Player):
     def __init__(self, player_num):
         super().__init__(player_num)
 
-# agent that loads and uses an existing model
+# agent that loads and uses an existing model, or asks a shared inference server when given a client
 class RLModelAgent(Player):
-    def __init__(self, player_num, algo='ppo_mask', path=None):
+    def __init__(self, player_num, algo='ppo_mask', path=None, client=None):
         super().__init__(player_num)
         if not path:
             raise Exception('need valid path model')
 
         self.algo = algo
+        self.path = path
+        self.client = client
         self.model = None
-        if algo == 'ppo':
-            self.model = PPO.load(path)
-        elif algo == 'dqn':
-            self.model = DQN.load(path)
-        elif algo == 'ppo_mask':
-            self.model = MaskablePPO.load(path)
+        if client is None:
+            self.model = load_model(algo, path)
 
     def action(self, info):
+        if self.client is not None:
+            return self.client.predict(self.path, info['observation'], info['action_mask'])
+
         action = None
         if self.algo == 'ppo_mask':
             action, _ = self.model.predict(info['observation'], action_masks=info['action_mask'])
@@ -0,0 +1,32 @@
+from agents.league_agent import LeagueAgent
+from agents.mcts_agent import MCTSAgent
+from agents.random_agent import RandomAgent
+from agents.rl_agent import RLModelAgent
+from agents.sell_solver_agent import SellSolverAgent
+from agents.sub_optimal_agent import SubOptimalAgent
+from agents.value_agent import ValueAgent
+
+# build cpu agents from their str form, e.g. "srvmte" is suboptimal, random, value, model, mcts and sell solver
+# model agents ask the inference server through client instead of loading their model when one is given
+# league agents "l" draw a snapshot of the league dir every game
+def build_players(agents, models=[], player_num=0, client=None, league=None):
+    players = []
+    m_count = 0
+    for agent in agents:
+        if agent == 's':
+            players.append(SubOptimalAgent(player_num))
+        elif agent == 'r':
+            players.append(RandomAgent(player_num))
+        elif agent == 'v':
+            players.append(ValueAgent(player_num))
+        elif agent == 'm':
+            players.append(RLModelAgent(player_num, algo='ppo_mask', path=models[m_count], client=client))
+            m_count += 1
+        elif agent == 't':
+            players.append(MCTSAgent(player_num))
+        elif agent == 'e':
+            players.append(SellSolverAgent(player_num))
+        elif agent == 'l':
+            players.append(LeagueAgent(player_num, path=league))
+        player_num += 1
+    return players
@@ -0,0 +1,39 @@
+from agents.value_agent import ValueAgent
+from env import Action, Stage
+from sell_solver import SellSolver, position_from_state
+
+# buys like the value agent and sells with the exact solver once at most max_rounds sell rounds are left
+# agents can share one solver and its table, table is an optional path of a table made by sell_solver.py
+class SellSolverAgent(ValueAgent):
+    # default sell rounds solved per game size, 6 player games with 3 rounds left take minutes to solve cold
+    MAX_ROUNDS = {
+        3: 3,
+        4: 3,
+        5: 2,
+        6: 2
+    }
+
+    # sells need the game state, so batched engines have to ask action like any other agent
+    batch_action = None
+
+    def __init__(self, player_num, max_rounds=None, solver=None, table=None, max_entries=1000000):
+        super().__init__(player_num)
+        self.max_rounds = max_rounds
+        self.solver = solver or SellSolver(max_entries=max_entries)
+        if table is not None:
+            self.solver.load(table)
+
+    def action(self, info):
+        if info['stage'] == Stage.BUYING:
+            return super().action(info)
+
+        state = info['get_state']()
+        hands, money = position_from_state(state)
+        max_rounds = self.max_rounds or self.MAX_ROUNDS[state.num_players]
+        if len(hands[self.num]) > max_rounds:
+            return super().action(info)
+
+        # choices already made this round are hidden in the real game, so solve from the start of the round
+        profile, _ = self.solver.solve(hands, money, state.board)
+        card = hands[self.num][profile[self.num]]
+        return Action.SELL_1 + info['property'].index(card)
@@ -0,0 +1,183 @@
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from agents.rl_agent import RLTrainingAgent
+from agents.roster import build_players
+from env import ForSale
+from fast_env import FastForSale
+import game_state
+
+# fixed benchmark scenarios for the env, agents and training, run from the repo root:
+# python -m benchmarks.run --out bench.json [--models <m>] [--compare baseline.json]
+# metrics ending in _us are latencies where lower is better, everything else is a rate where higher is better
+
+NUM_PLAYERS = [3, 4, 5, 6]
+MIXES = ['s', 'r', 'v']
+
+def percentiles(samples, prefix):
+    samples = np.array(samples) * 1e6
+    return {
+        prefix + '.p50_us': float(np.percentile(samples, 50)),
+        prefix + '.p90_us': float(np.percentile(samples, 90)),
+        prefix + '.p99_us': float(np.percentile(samples, 99))
+    }
+
+# live player picks a random legal action, opponents are all of one type
+def bench_env(num_players, mix, models, num_games, seed, engine=ForSale, name='env', obs_mode='raw'):
+    agents = mix * (num_players - 1)
+    players = build_players(agents, models * (num_players - 1))
+    players.append(RLTrainingAgent(num_players - 1))
+    env = engine(players, live_player=num_players - 1, obs_mode=obs_mode)
+    rng = np.random.default_rng(seed)
+
+    reset_times = []
+    mask_times = []
+    steps = 0
+    start = time.perf_counter()
+    for i in range(num_games):
+        reset_start = time.perf_counter()
+        env.reset(seed=seed + i)
+        reset_times.append(time.perf_counter() - reset_start)
+        done = False
+        while not done:
+            mask_start = time.perf_counter()
+            action_mask = env.get_action_mask()
+            mask_times.append(time.perf_counter() - mask_start)
+            _, _, done, _ = env.step(rng.choice(np.flatnonzero(action_mask)))
+            steps += 1
+    elapsed = time.perf_counter() - start
+
+    prefix = '{}.p{}.{}'.format(name, num_players, mix * 2)
+    results = {
+        prefix + '.games_per_sec': num_games / elapsed,
+        prefix + '.steps_per_sec': steps / elapsed
+    }
+    results.update(percentiles(reset_times, prefix + '.reset'))
+    results.update(percentiles(mask_times, prefix + '.get_action_mask'))
+    return results
+
+# latency of agent.action on info dicts collected from real games
+def bench_agent(letter, models, num_games, seed):
+    num_players = 4
+    players = build_players('r' * num_players)
+    env = ForSale(players)
+    infos = []
+    for i in range(num_games):
+        env.reset(options={'init': True}, seed=seed + i)
+        while not env.is_game_over:
+            infos.append(dict(env.info, observation=env.obs_buffer.copy()))
+            env._execute_action(players[env.curr_player].action(env.info))
+
+    agent = build_players(letter, models)[0]
+    times = []
+    for info in infos:
+        start = time.perf_counter()
+        agent.action(info)
+        times.append(time.perf_counter() - start)
+    return percentiles(times, 'agent.{}.action'.format(letter))
+
+def bench_vec_env(num_players, num_envs, num_steps, seed):
+    from vec_env import VecForSale
+
+    players = build_players('v' * (num_players - 1))
+    players.append(RLTrainingAgent(num_players - 1))
+    env = VecForSale(players, num_players - 1, num_envs=num_envs)
+    env.seed(seed)
+    env.reset()
+    rng = np.random.default_rng(seed)
+
+    start = time.perf_counter()
+    for _ in range(num_steps):
+        action_masks = env.action_masks()
+        actions = [rng.choice(np.flatnonzero(x)) for x in action_masks]
+        env.step(actions)
+    elapsed = time.perf_counter() - start
+    return {'vec_env.p{}.vv.n{}.steps_per_sec'.format(num_players, num_envs): num_steps * num_envs / elapsed}
+
+def bench_game_state(num_iters):
+    results = {}
+    for num_players in NUM_PLAYERS:
+        for name, rate in game_state.benchmark(num_players, num_iters).items():
+            results['game_state.p{}.{}_per_sec'.format(num_players, name)] = rate
+    return results
+
+# steps per second of the maskable ppo learn loop, env time included
+def bench_learn(num_steps, seed):
+    from sb3_contrib.common.maskable.policies import MaskableActorCriticPolicy
+    from sb3_contrib.common.wrappers import ActionMasker
+    from sb3_contrib.ppo_mask import MaskablePPO
+
+    players = build_players('vv')
+    players.append(RLTrainingAgent(2))
+    env = ActionMasker(ForSale(players, live_player=2), lambda env : env.get_action_mask())
+    env.reset(seed=seed)
+    model = MaskablePPO(MaskableActorCriticPolicy, env, n_steps=512, seed=seed, verbose=0)
+
+    start = time.perf_counter()
+    model.learn(total_timesteps=num_steps)
+    return {'learn.ppo_mask.p3.vv.steps_per_sec': num_steps / (time.perf_counter() - start)}
+
+def run(models=[], num_games=100, learn_steps=4096, seed=0):
+    results = {}
+    mixes = MIXES + (['m'] if models else [])
+    for num_players in NUM_PLAYERS:
+        for mix in mixes:
+            results.update(bench_env(num_players, mix, models, num_games, seed))
+        results.update(bench_env(num_players, 'r', models, num_games, seed, FastForSale, 'fast_env'))
+        results.update(bench_env(num_players, 'r', models, num_games, seed, ForSale, 'env_norm', 'norm'))
+    for letter in mixes:
+        results.update(bench_agent(letter, models, num_games // 4, seed))
+    results.update(bench_vec_env(4, 64, num_games, seed))
+    results.update(bench_game_state(num_games * 100))
+    if learn_steps > 0:
+        results.update(bench_learn(learn_steps, seed))
+    return results
+
+# flag every metric that got worse than the baseline by more than threshold
+def compare(results, baseline, threshold=0.1):
+    regressions = []
+    for name, base in sorted(baseline.items()):
+        if name not in results or base == 0:
+            continue
+        change = (results[name] - base) / base
+        if name.endswith('_us'):
+            change = -change
+        status = 'REGRESSION' if change < -threshold else 'ok'
+        if status != 'ok':
+            regressions.append(name)
+        print('{:55} {:>14.1f} {:>14.1f} {:+7.1%} {}'.format(name, base, results[name], change, status))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='benchmark arguments')
+    parser.add_argument('--out', default='bench_output.json')
+    parser.add_argument('--models', nargs='*', default=[])
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--learn_steps', type=int, default=4096)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compare', default=None)
+    parser.add_argument('--threshold', type=float, default=0.1)
+
+    args = parser.parse_args().__dict__
+    results = run(models=args['models'][:1], num_games=args['games'], learn_steps=args['learn_steps'], seed=args['seed'])
+    output = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'games': args['games'],
+        'results': results
+    }
+    with open(args['out'], 'w') as f:
+        json.dump(output, f, indent=2, sort_keys=True)
+
+    if args['compare']:
+        with open(args['compare']) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args['threshold'])
+        if regressions:
+            print('{} regressions against {}'.format(len(regressions), args['compare']))
+            sys.exit(1)
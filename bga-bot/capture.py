@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from PIL import Image, ImageGrab
+
+from digits import DigitRecognizer
+from main import BROWSER_BOX, get_digit_boxes, num_players
+
+# polls frames and keeps each region's crop from when it was last read, only regions whose pixels changed since are
+# read again, so a card fading in over many frames still counts once the change adds up
+# a region read while it's still moving is read again next frame, until it holds still for a frame
+# a region is a list of digit boxes read left to right into one number, None when every box is empty
+# cards come from main's card boxes, bid and coin regions depend on the table layout and are passed in as json
+# e.g. {"bid": [[x1, y1, x2, y2], [x1, y1, x2, y2]], "coins": [...]}
+
+DIFF_THRESHOLD = 8 # mean absolute pixel change for a region to count as changed
+SETTLE_THRESHOLD = 0.5 # mean absolute pixel change between frames for a region to count as still moving
+
+def get_card_regions():
+    boxes = get_digit_boxes()
+    return {'card_{}'.format(i): boxes[2 * i:2 * i + 2] for i in range(num_players)}
+
+# live frames of the browser
+class ScreenSource ():
+    def __init__(self, box=BROWSER_BOX):
+        self.box = box
+
+    def next_frame(self):
+        return np.asarray(ImageGrab.grab(self.box))
+
+# recorded frames in file name order, for running the loop offline
+class DirectorySource ():
+    def __init__(self, path):
+        self.paths = sorted(os.path.join(path, x) for x in os.listdir(path) if x.lower().endswith(('.png', '.jpg', '.bmp')))
+        self.index = 0
+
+    def next_frame(self):
+        if self.index >= len(self.paths):
+            return None
+        frame = np.asarray(Image.open(self.paths[self.index]).convert('RGB'))
+        self.index += 1
+        return frame
+
+class CaptureLoop ():
+    def __init__(self, source, recognizer, regions=None, budget=0.05, on_change=None):
+        self.source = source
+        self.recognizer = recognizer
+        # dicts keep insertion order, earlier regions are read first when the budget runs out
+        self.regions = get_card_regions()
+        self.regions.update(regions or {})
+        self.bounds = {name: self._get_bounds(boxes) for name, boxes in self.regions.items()}
+        self.budget = budget
+        self.on_change = on_change or print
+        self.prev_frame = None
+        self.references = {}
+        self.state = {name: None for name in self.regions}
+        self.dirty = set(self.regions)
+        self.frames = 0
+        self.reads = 0
+        self.overruns = 0
+
+    def _get_bounds(self, boxes):
+        return (min(x[0] for x in boxes), min(x[1] for x in boxes), max(x[2] for x in boxes), max(x[3] for x in boxes))
+
+    def _crop(self, frame, name):
+        x1, y1, x2, y2 = self.bounds[name]
+        return frame[y1:y2, x1:x2].astype(np.int16)
+
+    def _changed(self, frame, name):
+        return np.abs(self._crop(frame, name) - self.references[name]).mean() > DIFF_THRESHOLD
+
+    def _moving(self, frame, name):
+        return np.abs(self._crop(frame, name) - self._crop(self.prev_frame, name)).mean() > SETTLE_THRESHOLD
+
+    def _read(self, frame, name):
+        self.references[name] = self._crop(frame, name)
+        digits = self.recognizer.read([frame[y1:y2, x1:x2] for x1, y1, x2, y2 in self.regions[name]])
+        value = ''.join(digits)
+        return int(value) if value else None
+
+    # diff the regions of one frame against their last read and read what changed, regions left when the budget is
+    # spent stay dirty, returns the state change events of the frame
+    def process(self, frame):
+        start = time.perf_counter()
+        is_same_shape = self.prev_frame is not None and self.prev_frame.shape == frame.shape
+        if is_same_shape:
+            for name in self.regions:
+                if name not in self.dirty and self._changed(frame, name):
+                    self.dirty.add(name)
+        else:
+            self.dirty = set(self.regions)
+        self.frames += 1
+
+        events = []
+        num_reads = 0
+        for name in self.regions:
+            if name not in self.dirty:
+                continue
+            # at least one region per frame so a tight budget still makes progress
+            if num_reads > 0 and time.perf_counter() - start > self.budget:
+                self.overruns += 1
+                break
+            value = self._read(frame, name)
+            num_reads += 1
+            self.reads += 1
+            if not (is_same_shape and self._moving(frame, name)):
+                self.dirty.discard(name)
+            if value != self.state[name]:
+                events.append({'region': name, 'value': value, 'previous': self.state[name], 'frame': self.frames})
+                self.state[name] = value
+
+        self.prev_frame = frame
+        for event in events:
+            self.on_change(event)
+        return events
+
+    # poll until the source runs out or max_frames, one frame per interval seconds at most
+    def run(self, interval=0.2, max_frames=None):
+        while max_frames is None or self.frames < max_frames:
+            start = time.perf_counter()
+            frame = self.source.next_frame()
+            if frame is None:
+                break
+            self.process(frame)
+            time.sleep(max(0, interval - (time.perf_counter() - start)))
+        return self.state
+
+    def stats(self):
+        return {'frames': self.frames, 'reads': self.reads, 'overruns': self.overruns}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='capture loop arguments')
+    parser.add_argument('--frames', default=None)
+    parser.add_argument('--regions', default=None)
+    parser.add_argument('--budget', type=float, default=0.05)
+    parser.add_argument('--interval', type=float, default=0.2)
+
+    args = parser.parse_args().__dict__
+    regions = None
+    if args['regions']:
+        with open(args['regions']) as f:
+            regions = json.load(f)
+    # recorded frames play back as fast as they can be read
+    source = DirectorySource(args['frames']) if args['frames'] else ScreenSource()
+    interval = 0 if args['frames'] else args['interval']
+
+    loop = CaptureLoop(source, DigitRecognizer.load(), regions, budget=args['budget'])
+    loop.run(interval)
+    print(loop.stats())
@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+
+# in process digit reader for card crops, each crop is binarized, cut to its ink and scaled to a small grid
+# then matched against one averaged template per digit, a crop with no ink is a blank slot
+# templates are built once by calibrate from crops with known digits and cached in an npz next to this file
+
+TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'digit_templates.npz')
+TEMPLATE_SHAPE = (16, 10)
+MIN_CONTRAST = 40 # a crop with less gray level range than this is an empty slot
+MIN_INK = 4
+
+# grayscale float array from a PIL image or an rgb/gray array
+def to_gray(img):
+    arr = np.asarray(img, dtype=np.float32)
+    if arr.ndim == 3:
+        arr = arr[:, :, :3].mean(axis=2)
+    return arr
+
+# otsu threshold on the crop's histogram, digits are darker than the card so ink is below the threshold
+def binarize(gray):
+    levels = np.clip(gray, 0, 255).astype(np.uint8)
+    hist = np.bincount(levels.ravel(), minlength=256).astype(np.float64)
+    weight = np.cumsum(hist)
+    mean = np.cumsum(hist * np.arange(256))
+    total, total_mean = weight[-1], mean[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (total_mean * weight - mean * total) ** 2 / (weight * (total - weight))
+    between = np.where(np.isfinite(between), between, -1)
+    # middle of the best range, a clean two tone crop scores the same for every level between its tones
+    threshold = np.flatnonzero(between == between.max()).mean()
+    return levels <= threshold
+
+# ink cut to its bounding box and sampled to TEMPLATE_SHAPE, None when the slot is empty
+def normalize(img):
+    gray = to_gray(img)
+    if gray.max() - gray.min() < MIN_CONTRAST:
+        return None
+    ink = binarize(gray)
+    if ink.sum() < MIN_INK:
+        return None
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    ink = ink[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+    h, w = TEMPLATE_SHAPE
+    ys = (np.arange(h) * ink.shape[0] // h)
+    xs = (np.arange(w) * ink.shape[1] // w)
+    return ink[ys[:, None], xs].astype(np.float32).ravel()
+
+class DigitRecognizer ():
+    def __init__(self, templates=None):
+        self.digits = []
+        self.templates = None
+        if templates is not None:
+            self.set_templates(templates)
+
+    def set_templates(self, templates):
+        self.digits = sorted(templates)
+        self.templates = np.stack([templates[x] for x in self.digits])
+
+    # templates are the mean normalized crop of each digit, samples are (crop, digit str) with '' for blank crops
+    def calibrate(self, samples):
+        sums = {}
+        counts = {}
+        for img, digit in samples:
+            vec = normalize(img)
+            if vec is None or digit == '':
+                continue
+            sums[digit] = sums.get(digit, 0) + vec
+            counts[digit] = counts.get(digit, 0) + 1
+        if not sums:
+            raise Exception('no digit samples to calibrate from')
+        self.set_templates({x: sums[x] / counts[x] for x in sums})
+
+    # digit str of every crop, '' for empty slots, one distance matrix for the whole batch
+    def read(self, imgs):
+        if self.templates is None:
+            raise Exception('digit recognizer is not calibrated')
+        vecs = [normalize(x) for x in imgs]
+        digits = [''] * len(vecs)
+        idx = [i for i, x in enumerate(vecs) if x is not None]
+        if idx:
+            batch = np.stack([vecs[i] for i in idx])
+            dists = (batch ** 2).sum(axis=1)[:, None] - 2 * batch @ self.templates.T + (self.templates ** 2).sum(axis=1)
+            for i, best in zip(idx, dists.argmin(axis=1)):
+                digits[i] = self.digits[best]
+        return digits
+
+    def save(self, path=TEMPLATES_PATH):
+        np.savez(path, digits=np.array(self.digits), templates=self.templates)
+
+    @classmethod
+    def load(cls, path=TEMPLATES_PATH):
+        data = np.load(path)
+        return cls(dict(zip([str(x) for x in data['digits']], data['templates'])))
@@ -1,12 +1,10 @@
+import argparse
 import os
 import time
 
-import cv2
 from PIL import ImageGrab, Image
-import numpy as np
-import pytesseract
 
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract' # windows tessaract fix
+from digits import DigitRecognizer, TEMPLATES_PATH
 
 BROWSER_BOX = (0, 0, 937, 1070)
 FIRST_NUM_BOX = (16, 384, 30, 415)
@@ -15,48 +13,94 @@ NEXT_CARD_OFFSET = 111
 
 num_players = 3
 
-def get_board_cards(img):
-
-    def img_to_card(img):
-        # card_img = process_img(img)
-        save_img(img)
-        card = pytesseract.image_to_string(img, config='--psm 10')
-        print(card)
-        return card if len(card) == 1 else card[0]
-
-    cards = []
+# both digit boxes of every board card, left to right
+def get_digit_boxes():
+    boxes = []
     for i in range(num_players):
         x1, y1, x2, y2 = FIRST_NUM_BOX
         x1 += NEXT_CARD_OFFSET * i
         x2 += NEXT_CARD_OFFSET * i
-        first_box = (x1, y1, x2, y2)
-        second_box = (x1 + SECOND_NUM_OFFSET, y1, x2 + SECOND_NUM_OFFSET, y2)
+        boxes.append((x1, y1, x2, y2))
+        boxes.append((x1 + SECOND_NUM_OFFSET, y1, x2 + SECOND_NUM_OFFSET, y2))
+    return boxes
 
-        card = img_to_card(img.crop(first_box)) + img_to_card(img.crop(second_box))
-        cards.append(card)
+# card values of the board, every digit of every card is read in one batch
+# crops are only written to disk when a save_dir is given
+def get_board_cards(img, recognizer, save_dir=None):
+    crops = [img.crop(box) for box in get_digit_boxes()]
+    if save_dir:
+        for crop in crops:
+            save_img(crop, save_dir)
 
+    digits = recognizer.read(crops)
+    cards = []
+    for i in range(num_players):
+        card = digits[2 * i] + digits[2 * i + 1]
+        cards.append(int(card) if card else None)
     return cards
 
-def process_img(img):
-    # convert img to opencv for adaptive thresholding
-    opencv_img = np.array(img)
-    opencv_img = cv2.cvtColor(opencv_img, cv2.COLOR_BGR2GRAY)
-    opencv_img = cv2.adaptiveThreshold(opencv_img, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 5, 10)
+# known cards of a screenshot as (crop, digit) samples, single digit cards leave the second box blank
+def get_samples(img, cards):
+    crops = [img.crop(box) for box in get_digit_boxes()]
+    samples = []
+    for i, card in enumerate(cards):
+        digits = str(card)
+        samples.append((crops[2 * i], digits[0]))
+        samples.append((crops[2 * i + 1], digits[1] if len(digits) > 1 else ''))
+    return samples
+
+def save_img(img, save_dir):
+    os.makedirs(save_dir, exist_ok=True)
+    img.save(os.path.join(save_dir, '{}.png'.format(time.time())), 'PNG')
 
-    return opencv_img
+# fixture screenshots are named by their board, e.g. 3_14_25.png
+def get_fixture_cards(path):
+    return [int(x) for x in os.path.splitext(os.path.basename(path))[0].split('_')]
 
-def save_img(opencv_img):
-    # convert opencv img back to PIL and save
-    time_str = str(time.time())
-    # opencv_img = cv2.cvtColor(opencv_img, cv2.COLOR_BGR2RGB)
-    # img = Image.fromarray(opencv_img)
-    opencv_img.save(os.getcwd() + f'\\img\\{time_str}.png', 'PNG')
+def calibrate(paths, out=TEMPLATES_PATH):
+    samples = []
+    for path in paths:
+        samples += get_samples(Image.open(path), get_fixture_cards(path))
+    recognizer = DigitRecognizer()
+    recognizer.calibrate(samples)
+    recognizer.save(out)
+    print('Calibrated digits {} from {} screenshots'.format(recognizer.digits, len(paths)))
+    return recognizer
 
-def main():
+# read every fixture offline and report mistakes and time per board
+def check(paths, recognizer):
+    correct = 0
+    elapsed = 0
+    for path in paths:
+        img = Image.open(path)
+        img.load()
+        start = time.perf_counter()
+        cards = get_board_cards(img, recognizer)
+        elapsed += time.perf_counter() - start
+        expected = get_fixture_cards(path)
+        if cards == expected:
+            correct += 1
+        else:
+            print('{}: read {}'.format(path, cards))
+    print('Boards read correctly: {}/{} | ms per board: {:.2f}'.format(correct, len(paths), elapsed / max(len(paths), 1) * 1000))
+
+def main(save_dir=None):
+    recognizer = DigitRecognizer.load()
     game_img = ImageGrab.grab(BROWSER_BOX)
-    cards = get_board_cards(game_img)
+    cards = get_board_cards(game_img, recognizer, save_dir)
 
     print(cards)
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='bga bot arguments')
+    parser.add_argument('--calibrate', nargs='*', default=None)
+    parser.add_argument('--check', nargs='*', default=None)
+    parser.add_argument('--save_dir', default=None)
+
+    args = parser.parse_args().__dict__
+    if args['calibrate']:
+        calibrate(args['calibrate'])
+    elif args['check']:
+        check(args['check'], DigitRecognizer.load())
+    else:
+        main(args['save_dir'])
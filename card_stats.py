@@ -0,0 +1,85 @@
+import json
+import os
+from fractions import Fraction
+from math import comb
+
+from env import ForSale
+
+# exact expected card values per board rank from order statistics, cached on disk per game size and deck variant
+# removal is how smaller games drop cards: random like ForSale, or lowest which drops the first cards of the unshuffled decks
+# coins is the starting coin variant: standard (NUM_COINS) or big_money (NUM_COINS_BIG_MONEY)
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'card_stats.json')
+PROPERTY_DECK = list(range(1, 31))
+MONEY_DECK = [0, 0] + list(range(2, 16)) + list(range(2, 16))
+
+_cache = None
+
+def _get_deck(deck, num_players, removal):
+    if removal == 'lowest':
+        return deck[len(deck) - ForSale.NUM_CARDS[num_players]:]
+    # with random removal every board is still a uniform sample of the whole deck
+    return deck
+
+# expected value of each rank of a sorted board of size cards drawn without replacement from deck
+def expected_ranks(deck, size):
+    values = sorted(set(deck))
+    total = comb(len(deck), size)
+    ranks = []
+    for k in range(1, size + 1):
+        # P(rank k <= v) is P(at least k of the board are <= v), a hypergeometric tail
+        expected = 0
+        prev_cdf = 0
+        for v in values:
+            num_below = sum(1 for x in deck if x <= v)
+            cdf = Fraction(sum(comb(num_below, j) * comb(len(deck) - num_below, size - j) for j in range(k, size + 1)), total)
+            expected += v * (cdf - prev_cdf)
+            prev_cdf = cdf
+        ranks.append(expected)
+    return ranks
+
+def compute_card_stats(num_players, removal='random', coins='standard'):
+    property_ranks = expected_ranks(_get_deck(PROPERTY_DECK, num_players, removal), num_players)
+    money_ranks = expected_ranks(_get_deck(MONEY_DECK, num_players, removal), num_players)
+    prop_val = sum(property_ranks) / num_players
+    money_val = sum(money_ranks) / num_players
+    # exact fractions until here so averages like 18.5 stay exact
+    return {
+        'property_ranks': [float(x) for x in property_ranks],
+        'money_ranks': [float(x) for x in money_ranks],
+        'property': float(prop_val),
+        'money': float(money_val),
+        'money_per_property': float(money_val / prop_val),
+        'coins': (ForSale.NUM_COINS if coins == 'standard' else ForSale.NUM_COINS_BIG_MONEY)[num_players]
+    }
+
+def get_card_stats(num_players, removal='random', coins='standard'):
+    global _cache
+    if _cache is None:
+        _cache = {}
+        if os.path.isfile(CACHE_PATH):
+            with open(CACHE_PATH) as f:
+                _cache = json.load(f)
+
+    key = '{}_{}_{}'.format(num_players, removal, coins)
+    if key not in _cache:
+        _cache[key] = compute_card_stats(num_players, removal, coins)
+        # written aside and swapped in so worker processes never read a half written cache
+        tmp_path = '{}.{}.tmp'.format(CACHE_PATH, os.getpid())
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(_cache, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, CACHE_PATH)
+        except OSError:
+            # read only checkouts still get the in memory values
+            pass
+    return _cache[key]
+
+if __name__ == "__main__":
+    for removal in ('random', 'lowest'):
+        for num_players in range(3, 7):
+            stats = get_card_stats(num_players, removal)
+            print("Num players: {} | removal: {} | avg property value per round: {} | avg money value per round {} | avg dollar earned per 1 property value {} ".format(
+                num_players, removal, round(stats['property'], 2), round(stats['money'], 2), round(stats['money_per_property'], 2)))
+            print("Distribution of property cards: {}".format([round(x, 2) for x in stats['property_ranks']]))
+            print("Distribution of money cards: {} \n".format([round(x, 2) for x in stats['money_ranks']]))
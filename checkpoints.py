@@ -0,0 +1,137 @@
+import multiprocessing as mp
+import os
+import pickle
+import random
+import re
+
+import numpy as np
+import torch
+from stable_baselines3.common.callbacks import BaseCallback
+
+# resumable training checkpoints, each is the sb3 model zip (policy and optimizer state, timesteps) plus a pickle of
+# the python, numpy and torch rng states, named step_<timesteps> in the run's checkpoint dir
+# the envs' own deal rngs aren't saved, a resumed run reseeds its envs from seed + timesteps so it deals new games
+# instead of replaying the ones from the start of the run
+# every checkpoint is rated by a background process against fixed rosters so the learner never waits on games,
+# the win rates are logged to the run's tensorboard dir as eval/win_rate_<roster>
+
+CHECKPOINT_PREFIX = 'step_'
+
+def save_checkpoint(model, path):
+    os.makedirs(path, exist_ok=True)
+    file_path = os.path.join(path, '{}{}'.format(CHECKPOINT_PREFIX, model.num_timesteps))
+    model.save(file_path)
+    rng_state = {
+        'random': random.getstate(),
+        'numpy': np.random.get_state(),
+        'torch': torch.get_rng_state(),
+        'cuda': torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None
+    }
+    # rng file last, a checkpoint counts once it's there
+    with open(file_path + '.rng.tmp', 'wb') as f:
+        pickle.dump(rng_state, f)
+    os.replace(file_path + '.rng.tmp', file_path + '.rng')
+    return file_path
+
+# path of the checkpoint with the most timesteps in a dir, None when it has none
+def latest_checkpoint(path):
+    if not os.path.isdir(path):
+        return None
+    steps = [int(x.group(1)) for x in (re.fullmatch(CHECKPOINT_PREFIX + r'(\d+)\.rng', x) for x in os.listdir(path)) if x]
+    if not steps:
+        return None
+    return os.path.join(path, '{}{}'.format(CHECKPOINT_PREFIX, max(steps)))
+
+# latest checkpoint of a dir loaded onto env, rngs are restored after load since loading reseeds them
+# with a seed the envs deal from seed + the checkpoint's timesteps on their next reset
+def load_checkpoint(algo_class, path, env, seed=None):
+    file_path = latest_checkpoint(path)
+    if file_path is None:
+        raise Exception('no checkpoint to resume in {}'.format(path))
+    model = algo_class.load(file_path, env=env)
+    with open(file_path + '.rng', 'rb') as f:
+        rng_state = pickle.load(f)
+    random.setstate(rng_state['random'])
+    np.random.set_state(rng_state['numpy'])
+    torch.set_rng_state(rng_state['torch'])
+    if rng_state['cuda'] is not None and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(rng_state['cuda'])
+    if seed is not None:
+        # the model's env is always a vec env, seeds apply on the reset learn does for a loaded model
+        model.get_env().seed(seed + model.num_timesteps)
+    return model
+
+# win rate of the model at path in the last seat, the seat it trains in, against a roster str on fixed seeds
+def evaluate(path, algo, roster, games, seed=0, obs_mode='raw'):
+    from agents.rl_agent import RLModelAgent
+    from agents.roster import build_players
+    from fast_env import FastForSale
+
+    num_players = len(roster) + 1
+    players = build_players(roster)
+    players.append(RLModelAgent(num_players - 1, algo=algo, path=path))
+    env = FastForSale(players, obs_mode=obs_mode)
+    wins = 0
+    for game in range(games):
+        random.seed(seed + game)
+        env.reset(seed=seed + game)
+        winner = max(range(num_players), key=lambda i : (players[i].coins + players[i].money, players[i].coins, i))
+        wins += winner == num_players - 1
+    return wins / max(games, 1)
+
+def _evaluate_worker(checkpoint_queue, log_dir, rosters, games, seed, obs_mode):
+    from stable_baselines3.common.logger import configure
+
+    logger = configure(log_dir, ['tensorboard'])
+    while True:
+        checkpoint = checkpoint_queue.get()
+        if checkpoint is None:
+            break
+        for roster in rosters:
+            logger.record('eval/win_rate_{}'.format(roster), evaluate(checkpoint['path'], checkpoint['algo'], roster, games, seed, obs_mode))
+        logger.dump(checkpoint['steps'])
+    logger.close()
+
+# saves a checkpoint every checkpoint_freq steps and at the end of training, then queues it for the evaluator process
+class CheckpointCallback (BaseCallback):
+    def __init__(self, path, algo='ppo_mask', checkpoint_freq=100000, rosters=[], eval_games=50, seed=0, obs_mode='raw', verbose=0):
+        super().__init__(verbose)
+        self.path = path
+        self.algo = algo
+        self.checkpoint_freq = checkpoint_freq
+        self.rosters = rosters
+        self.eval_games = eval_games
+        self.seed = seed
+        self.obs_mode = obs_mode
+        self.last_checkpoint = 0
+        self.checkpoint_queue = None
+        self.process = None
+
+    def _on_training_start(self):
+        # resumed runs count from their checkpoint
+        self.last_checkpoint = self.num_timesteps
+        if self.rosters:
+            ctx = mp.get_context('forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn')
+            self.checkpoint_queue = ctx.Queue()
+            args = (self.checkpoint_queue, self.logger.get_dir(), self.rosters, self.eval_games, self.seed, self.obs_mode)
+            self.process = ctx.Process(target=_evaluate_worker, args=args, daemon=True)
+            self.process.start()
+
+    def _on_step(self):
+        if self.num_timesteps - self.last_checkpoint >= self.checkpoint_freq:
+            self.checkpoint()
+        return True
+
+    def _on_training_end(self):
+        if self.num_timesteps != self.last_checkpoint:
+            self.checkpoint()
+        # queued checkpoints are still rated before training returns
+        if self.process is not None:
+            self.checkpoint_queue.put(None)
+            self.process.join()
+
+    def checkpoint(self):
+        self.last_checkpoint = self.num_timesteps
+        file_path = save_checkpoint(self.model, self.path)
+        if self.process is not None:
+            self.checkpoint_queue.put({'path': file_path, 'algo': self.algo, 'steps': self.num_timesteps})
@@ -4,6 +4,8 @@ from math import ceil
 import gym
 import numpy as np
 
+import events
+
 class Action (IntEnum):
     # either take or bid 1-2 coins more
     TAKE = 0
@@ -23,6 +25,27 @@ class Stage (IntEnum):
     BUYING = 0
     SELLING = 1
 
+# buying stage mask for every (last bid, coins, is last card)
+def _build_buy_action_masks(max_coins):
+    action_masks = np.zeros((max_coins + 1, max_coins + 1, 2, len(Action)), dtype=np.bool_)
+    action_masks[:, :, :, Action.TAKE] = True
+    for last_bid in range(max_coins + 1):
+        for coins in range(max_coins + 1):
+            for i in range(Action.BID_1, Action.BID_2 + 1):
+                action_masks[last_bid, coins, 0, i] = last_bid + i <= coins
+    action_masks.setflags(write=False)
+    return action_masks
+
+# selling stage mask for every set of unsold hand slots, slot i is bit i
+def _build_sell_action_masks():
+    num_slots = Action.SELL_8 - Action.SELL_1 + 1
+    action_masks = np.zeros((1 << num_slots, len(Action)), dtype=np.bool_)
+    for hand_bits in range(1 << num_slots):
+        for i in range(num_slots):
+            action_masks[hand_bits, Action.SELL_1 + i] = hand_bits >> i & 1
+    action_masks.setflags(write=False)
+    return action_masks
+
 # player represents state of agent in game
 class Player ():
     def __init__(self, player_num):
@@ -30,10 +53,15 @@ class Player ():
         self.coins = 0
         self.money = 0
         self.property = []
+        self.hand_bits = 0
         self.is_bidding = True
         self.bid = 0
         self.sell_property = 0
 
+    # called by ForSale.reset before every game, agents that change between games hook in here
+    def new_game(self):
+        pass
+
     def __repr__(self):
         return 'P{} | $: {} B: {} M: {} H: {}'.format(self.num, self.coins, self.bid, self.money, self.property)
 
@@ -56,29 +84,64 @@ class ForSale (gym.Env):
         5: 16,
         6: 14
     }
-
-    # pass in index of live player
-    def __init__(self, players, live_player=-1, render_mode='none'):
+    BUY_ACTION_MASKS = _build_buy_action_masks(max(NUM_COINS_BIG_MONEY.values()))
+    SELL_ACTION_MASKS = _build_sell_action_masks()
+    # raw is the int layout, norm and cards are float32 scaled to [0, 1], cards has a 30 card presence vector per hand
+    OBS_MODES = ('raw', 'norm', 'cards')
+    MAX_PROPERTY = 30
+    MAX_MONEY_CARD = 15
+
+    # pass in index of live player, profile times the hot paths and each agent's actions
+    # recorder is an optional recorder.TrajectoryRecorder that every game played is written to
+    # sinks get the game's events (see events.py), render_mode 'text' adds a console sink
+    # obs_mode picks the observation encoding, see OBS_MODES
+    def __init__(self, players, live_player=-1, render_mode='none', profile=False, recorder=None, sinks=None, obs_mode='raw'):
+        if obs_mode not in self.OBS_MODES:
+            raise Exception('obs mode must be one of {}'.format(', '.join(self.OBS_MODES)))
+        self.obs_mode = obs_mode
         self.render_mode = render_mode
+        self.recorder = recorder
+        self.sinks = list(sinks or [])
+        if render_mode == 'text':
+            self.sinks.append(events.ConsoleSink())
         self.num_players = len(players)
         self.players = players
         self.live_player = live_player
         self.action_space = gym.spaces.Discrete(len(Action))
+        self.profile = None
+        if profile:
+            self._init_profile()
+        self.obs_num_players = None
+        # all 30 cards, shuffled in place each game and dealt by cursor
+        self.property_deck = np.arange(1, 31)
+        self.money_deck = np.concatenate([[0, 0], np.arange(2, 16), np.arange(2, 16)])
+        self.rng = np.random.default_rng()
         self.reset(options={'init': True})
 
     def reset(self, return_info=False, seed=None, options=None):
         if self.num_players < 3 or self.num_players > 6:
             raise Exception('number of players must be 3-6')
-
-        # initial 30 cards
-        self.property_cards = np.arange(1, 31)
-        self.money_cards = np.concatenate([[0, 0], np.arange(2, 16), np.arange(2, 16)])
-        np.random.seed(seed)
-        np.random.shuffle(self.property_cards)
-        np.random.shuffle(self.money_cards)
-        while len(self.property_cards) != self.NUM_CARDS[self.num_players]:
-            self.property_cards = np.delete(self.property_cards, 0)
-            self.money_cards = np.delete(self.money_cards, 0)
+        if self.obs_num_players != self.num_players:
+            self._init_observation()
+        self.agent_actions = [self._get_agent_action(x) for x in self.players]
+
+        # each env owns its rng, a seed restarts it otherwise the stream continues between games
+        # recorded games always get a seed, drawn from the stream when none is given, so they can be replayed
+        if self.recorder is not None and seed is None:
+            seed = int(self.rng.integers(1 << 63))
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+
+        # sort back to a fixed order first so a seed always deals the same game
+        self.property_deck.sort()
+        self.money_deck.sort()
+        self.rng.shuffle(self.property_deck)
+        self.rng.shuffle(self.money_deck)
+        # smaller games skip the first cards of the deck
+        self.property_cursor = len(self.property_deck) - self.NUM_CARDS[self.num_players]
+        self.money_cursor = self.property_cursor
+        self.property_cards = self.property_deck[self.property_cursor:]
+        self.money_cards = self.money_deck[self.money_cursor:]
 
         # player defaults
         cards_per_player = self.NUM_CARDS[self.num_players] // self.num_players
@@ -88,33 +151,39 @@ class ForSale (gym.Env):
             player.is_bidding = True
             player.bid = 0
             player.property = [-1] * cards_per_player
+            player.hand_bits = 0
             player.sell_property = -1
+            player.new_game()
 
         # set board and stage
         self.stage = Stage.BUYING
         self.num_buy_round = 0
         self.num_buy_property = 0
         self.board = self._get_next_cards()
-        self.curr_player = np.random.randint(self.num_players)
+        self.curr_player = int(self.rng.integers(self.num_players))
         self.last_bid = 0
         self.num_sell_round = 0
         self.num_sell_property = 0
         self.is_game_over = False
         self.reward = 0
-
-        # for render function
-        self.action = None
+        # every action of the game in order, lets search agents follow the game between their moves
+        self.action_log = []
+        if self.recorder is not None:
+            self.recorder.start_game(seed, self.num_players, self.live_player)
         self.prev_player = None
-        self.sell_round_str = None
 
-        self._get_observation()
+        self._update_board_observation()
+        for i in range(self.num_players):
+            self._update_player_observation(i)
         self._get_info()
         
         if not (options and options['init']):
-            if self.render_mode != 'none':
-                self._render()
+            if self.sinks:
+                self._emit(events.GameStart(self.num_players, self.live_player, self.curr_player))
+                self._emit_board()
             # autoplay in case first player isn't the live player
             self._auto_play()
+        self._get_observation()
 
         if return_info:
             return self.observation, self.info
@@ -126,99 +195,204 @@ class ForSale (gym.Env):
         self.reward = 0
         self._execute_action(action)
         self._auto_play()
+        self._get_observation()
         return (self.observation, float(self.reward), self.is_game_over, self.info)
         
     def _execute_action(self, action):
-        self.action = action
+        self.action_log.append(int(action))
         self.prev_player = self.curr_player
+        board = self.board
+        stage = self.stage
+        action_mask = self.action_mask
 
         if self.stage == Stage.BUYING:
             self._resolve_buy_action(action)
         else:
             self._resolve_sell_action(action)
 
-        self._get_observation()
-        self._get_info()
+        if self.recorder is not None:
+            # without a live player selling rounds start at seat -1, the last seat
+            self.recorder.record(self.prev_player % self.num_players, stage, int(action), action_mask, self.reward)
+            if self.is_game_over:
+                self.recorder.end_game()
 
-        if self.render_mode != 'none':
-            self._render()
+        # only the acting player changes mid round, a new board means every player may have changed
+        self._update_board_observation()
+        if self.board is board:
+            self._update_player_observation(self.prev_player)
+        else:
+            for i in range(self.num_players):
+                self._update_player_observation(i)
+        self._get_info()
 
     # execute actions of all non-live agents, autoplays entire game if no live agent
     def _auto_play(self):
         while not self.is_game_over and (self.live_player == -1 or self.curr_player != self.live_player):
-            action = self.players[self.curr_player].action(self.info)
+            action = self.agent_actions[self.curr_player](self.info)
             self._execute_action(action)
 
+    # instance methods are swapped for timed ones so an env without a profile runs the plain methods
+    def _init_profile(self):
+        from profiling import EnvProfile
+
+        self.profile = EnvProfile()
+        for name in ('reset', 'step', '_execute_action', '_auto_play', '_get_observation', '_get_info'):
+            setattr(self, name, self.profile.timed(name.strip('_'), getattr(self, name)))
+
+    def _get_agent_action(self, player):
+        # the live player has no action
+        action = getattr(player, 'action', None)
+        if self.profile is None or action is None:
+            return action
+        return self.profile.timed('agent_{}'.format(player.num), action)
+
     # get next set of cards from board, always sorted
     def _get_next_cards(self):
-        cards = []
+        # remaining cards are views past the cursor into the deck
         if self.stage == Stage.BUYING:
-            cards = self.property_cards[:self.num_players]
-            self.property_cards = np.delete(self.property_cards, np.arange(self.num_players))
+            cards = self.property_deck[self.property_cursor:self.property_cursor + self.num_players]
+            self.property_cursor += self.num_players
+            self.property_cards = self.property_deck[self.property_cursor:]
         else:
-            cards = self.money_cards[:self.num_players]
-            self.money_cards = np.delete(self.money_cards, np.arange(self.num_players))
+            cards = self.money_deck[self.money_cursor:self.money_cursor + self.num_players]
+            self.money_cursor += self.num_players
+            self.money_cards = self.money_deck[self.money_cursor:]
         return np.sort(cards)
 
+    # observation layout is fixed per game size, board data then player data with the live player first
+    def _init_observation(self):
+        self.observation_space = self.get_observation_space(self.num_players, self.obs_mode)
+        board_len = 2 + self.num_players
+        player_len = self.get_player_obs_len(self.num_players, self.obs_mode)
+        self.obs_buffer = np.zeros(self.observation_space.shape, dtype=self.observation_space.dtype)
+        self.obs_board = self.obs_buffer[:board_len]
+        self.obs_players = []
+        for i in range(self.num_players):
+            start = board_len + ((i - self.live_player) % self.num_players) * player_len
+            self.obs_players.append(self.obs_buffer[start:start + player_len])
+
+        self.obs_num_players = self.num_players
+
+    # observation space for a game size, lets vectorized envs allocate buffers without building a game
+    @classmethod
+    def get_observation_space(cls, num_players, obs_mode='raw'):
+        obs_len = 2 + num_players + num_players * cls.get_player_obs_len(num_players, obs_mode)
+        if obs_mode == 'raw':
+            return gym.spaces.Box(low=-1, high=126, shape=(obs_len,), dtype=int)
+        return gym.spaces.Box(low=0, high=1, shape=(obs_len,), dtype=np.float32)
+
+    @classmethod
+    def get_player_obs_len(cls, num_players, obs_mode='raw'):
+        cards_per_player = cls.NUM_CARDS[num_players] // num_players
+        if obs_mode == 'raw':
+            return 5 + cards_per_player
+        return 4 + (cls.MAX_PROPERTY if obs_mode == 'cards' else cards_per_player)
+
+    # scaled observation values, scale_board and scale_player are one game in plain python for ForSale and FastForSale,
+    # encode_board and encode_player write the same values for a batch of games on the first axis for VecForSale
+    # board cards are scaled by the highest property or money card of the stage, an empty board is zeros
+    @classmethod
+    def scale_board(cls, num_players, stage, last_bid, board):
+        max_card = cls.MAX_PROPERTY if stage == Stage.BUYING else cls.MAX_MONEY_CARD
+        return [int(stage), last_bid / cls.NUM_COINS[num_players]] + ([x / max_card for x in board] if len(board) else [0] * num_players)
+
+    # player data without the seat, hands keep their slots in norm so sell actions still line up
+    # money is scaled by the most a player can sell for, 15 for every card
+    @classmethod
+    def scale_player(cls, num_players, obs_mode, coins, money, is_bidding, bid, property):
+        max_coins = cls.NUM_COINS[num_players]
+        obs = [coins / max_coins, money / (cls.MAX_MONEY_CARD * (cls.NUM_CARDS[num_players] // num_players)), int(is_bidding), bid / max_coins]
+        if obs_mode == 'norm':
+            return obs + [x / cls.MAX_PROPERTY if x > 0 else 0 for x in property]
+        obs += [0] * cls.MAX_PROPERTY
+        for x in property:
+            if x > 0:
+                obs[3 + x] = 1
+        return obs
+
+    @classmethod
+    def encode_board(cls, obs, num_players, stage, last_bid, board):
+        obs[..., 0] = stage
+        obs[..., 1] = np.divide(last_bid, cls.NUM_COINS[num_players])
+        obs[..., 2:] = np.divide(board, np.where(np.equal(stage, Stage.BUYING), cls.MAX_PROPERTY, cls.MAX_MONEY_CARD)[..., None])
+
+    @classmethod
+    def encode_player(cls, obs, num_players, obs_mode, coins, money, is_bidding, bid, property):
+        max_coins = cls.NUM_COINS[num_players]
+        obs[..., 0] = np.divide(coins, max_coins)
+        obs[..., 1] = np.divide(money, cls.MAX_MONEY_CARD * (cls.NUM_CARDS[num_players] // num_players))
+        obs[..., 2] = is_bidding
+        obs[..., 3] = np.divide(bid, max_coins)
+        if obs_mode == 'norm':
+            obs[..., 4:] = np.divide(np.maximum(property, 0), cls.MAX_PROPERTY)
+        else:
+            obs[..., 4:] = np.equal(np.expand_dims(property, -1), np.arange(1, cls.MAX_PROPERTY + 1)).any(axis=-2)
+
+    def _update_board_observation(self):
+        # board is empty once the game is over, keep its slots as zeros
+        if self.obs_mode != 'raw':
+            self.obs_board[:] = self.scale_board(self.num_players, self.stage, self.last_bid, self.board.tolist() if len(self.board) else ())
+            return
+        self.obs_board[0] = self.stage
+        self.obs_board[1] = self.last_bid
+        self.obs_board[2:] = self.board if len(self.board) else 0
+
+    def _update_player_observation(self, player_num):
+        player = self.players[player_num]
+        player_obs = self.obs_players[player_num]
+        if self.obs_mode != 'raw':
+            player_obs[:] = self.scale_player(self.num_players, self.obs_mode, player.coins, player.money, player.is_bidding, player.bid,
+                                              player.property)
+            return
+        player_obs[:5] = (player.num, player.coins, player.money, int(player.is_bidding), player.bid)
+        player_obs[5:] = player.property
+
+    # copy the buffer out only when control returns to the live player
     def _get_observation(self):
-        # board data
-        self.observation = np.concatenate(([self.stage, self.last_bid], self.board))
-        
-        # player data, append live player first then the rest
-        i = 0
-        j = self.live_player
-        while i < self.num_players:
-            player = self.players[j]
-            player_obs = np.concatenate(([player.num, player.coins, player.money, int(player.is_bidding), player.bid], player.property))
-            self.observation = np.concatenate((self.observation, player_obs))
-            j += 1
-            if j >= self.num_players:
-                j = 0
-            i += 1
-
-        self.observation = np.array(self.observation, dtype=int)
-        self.observation_space = gym.spaces.Box(low=-1, high=126, shape=self.observation.shape, dtype=int)
+        self.observation = self.obs_buffer.copy()
+        self.info['observation'] = self.observation
 
     def _get_info(self):
+        self.action_mask = self._lookup_action_mask(self.curr_player)
         self.info = {
             'stage': self.stage,
             'last_bid': self.last_bid,
             'num_buy_property': self.num_buy_property,
             'num_sell_round': self.num_sell_round,
             'num_players': self.num_players,
-            'observation': self.observation,
-            'action_mask': self.get_action_mask(player_num=self.curr_player),
+            'observation': self.obs_buffer,
+            'action_mask': self.action_mask,
             'board': self.board,
-            'property': self.players[self.curr_player].property
+            'property': self.players[self.curr_player].property,
+            'action_log': self.action_log,
+            'get_state': self.get_state
         }
     
-    # get all legal moves for a player then convert to action mask form
+    # compact copy of the game without agents, see game_state.GameState
+    def get_state(self):
+        from game_state import GameState
+
+        return GameState(self)
+
+    # read only action mask for a player, the current player's mask is already computed for this state
     def get_action_mask(self, player_num=None):
         if player_num == None:
             player_num = self.live_player
+        if player_num == self.curr_player:
+            return self.action_mask
+
+        return self._lookup_action_mask(player_num)
 
-        moves = []
+    def _lookup_action_mask(self, player_num):
         player = self.players[player_num]
         if self.stage == Stage.BUYING:
-            moves.append(Action.TAKE.value)
-            if not self._is_last_card():
-                for i in range(Action.BID_2):
-                    new_bid = Action.BID_1 + i + self.last_bid
-                    if new_bid <= player.coins:
-                        moves.append(Action.BID_1 + i)
-        else:
-            for i, property in enumerate(player.property):
-                if property != -1:
-                    moves.append(Action.SELL_1 + i)
-
-        action_mask = [False] * len(Action)
-        for move in moves:
-            action_mask[move] = True
-        return action_mask
+            return self.BUY_ACTION_MASKS[self.last_bid, player.coins, int(self._is_last_card())]
+        return self.SELL_ACTION_MASKS[player.hand_bits]
 
     def _resolve_illegal_action(self, action):
         if self.curr_player == self.live_player:
-            print(f'illegal action {action}')
+            if self.sinks:
+                self._emit(events.IllegalAction(self.curr_player, int(action)))
             self.reward = -1
             self.is_game_over = True
 
@@ -230,22 +404,25 @@ class ForSale (gym.Env):
 
         if action == Action.TAKE:
             # pay full bid if last card else pay half rounded up
-            if self._is_last_card():
-                player.coins -= player.bid
-            else:
-                player.coins -= ceil(player.bid / 2)
+            paid = player.bid if self._is_last_card() else ceil(player.bid / 2)
+            player.coins -= paid
             player.bid = 0
             player.is_bidding = False
             # remove lowest card from board into players properties
             card = self.board[self.num_buy_property]
             player.property[self.num_buy_round] = card
+            player.hand_bits |= 1 << self.num_buy_round
             self.num_buy_property += 1
+            if self.sinks:
+                self._emit(events.Take(player.num, int(card), int(paid)))
         elif action >= Action.BID_1 and action <= Action.BID_2:
             if self.last_bid + action > player.coins or self._is_last_card():
                 # illegal bid
                 return self._resolve_illegal_action(action)
             player.bid = self.last_bid + action
             self.last_bid = player.bid
+            if self.sinks:
+                self._emit(events.Bid(player.num, int(action), int(player.bid)))
         else:
             # illegal buy action
             return self._resolve_illegal_action(action)
@@ -264,6 +441,8 @@ class ForSale (gym.Env):
             self.num_buy_property = 0
             self.last_bid = 0
             self.board = self._get_next_cards()
+            if self.sinks:
+                self._emit_board()
         else:
             # cycle to next active player in round
             i = self.curr_player
@@ -288,21 +467,22 @@ class ForSale (gym.Env):
             # illegal sell action
             return self._resolve_illegal_action(action)
 
-        self.sell_round_str = None
         if self.num_sell_property == self.num_players:
             # all cards have been selected
             selected_cards = []
             for player in self.players:
                 selected_cards.append((player.property[player.sell_property], player.num))
                 player.property[player.sell_property] = -1
+                player.hand_bits &= ~(1 << player.sell_property)
                 player.sell_property = -1
             
             # distribute rewards
-            self.sell_round_str = 'Sell Round {}: '.format(self.num_sell_round + 1)
             selected_cards.sort(key=lambda x : x[0])
             for i, vals in enumerate(selected_cards):
                 self.players[vals[1]].money += self.board[i]
-                self.sell_round_str += 'P{} C:{} M:+{} | '.format(vals[1], vals[0], self.board[i])
+            if self.sinks:
+                results = [(vals[1], int(vals[0]), int(self.board[i])) for i, vals in enumerate(selected_cards)]
+                self._emit(events.SellRound(self.num_sell_round + 1, results))
 
             self.num_sell_round += 1
             self.num_sell_property = 0
@@ -314,8 +494,12 @@ class ForSale (gym.Env):
                 # winner has most money, tiebreaker is leftover coins
                 winner = sorted(self.players, key=lambda x : (x.coins + x.money, x.coins))[-1]
                 self.reward = 1 if winner.num == self.live_player else -1
+                if self.sinks:
+                    self._emit(events.GameOver(winner.num, [int(x.coins + x.money) for x in self.players]))
             else:
                 self.board = self._get_next_cards()
+                if self.sinks:
+                    self._emit_board()
         else:
             # cycle to next player for card selection
             i = self.curr_player
@@ -327,23 +511,20 @@ class ForSale (gym.Env):
                     self.curr_player = i
                     break
 
-    def _render(self):
-        if self.render_mode == 'text':
-            is_first_sell_round = self.num_sell_round == 0 and self.num_sell_property == 0
-            if self.stage == Stage.BUYING or is_first_sell_round:
-                if self.action != None:
-                    text = 'P{} performs {} '.format(self.prev_player, str(Action(self.action)))
-                    if self.action == Action.TAKE:
-                        i = self.num_buy_round if self.num_buy_property != 0 else self.num_buy_round - 1
-                        text += 'Card {}'.format(self.players[self.prev_player].property[i])
-                    else:
-                        text += 'Total Bid {}'.format(self.players[self.prev_player].bid)
-                    print(text, '\n')
-                print(self.board, self.players)
-            else:
-                if self.sell_round_str != None:
-                    print(self.sell_round_str, '\n')
-                    print(self.board, self.players)
-                if self.is_game_over:
-                    winner = sorted(self.players, key=lambda x : (x.coins + x.money, x.coins))[-1]
-                    print('Player P{} wins the game! {}'.format(winner.num, [x.coins + x.money for x in self.players]))
+    # events are only built when a sink is attached, callers check self.sinks first
+    def _emit(self, event):
+        for sink in self.sinks:
+            sink.emit(event)
+
+    def _emit_board(self):
+        self._emit(events.Board(
+            int(self.stage), [int(x) for x in self.board], [int(x.coins) for x in self.players],
+            [int(x.money) for x in self.players], [[int(c) for c in x.property] for x in self.players]
+        ))
+
+    # sinks write out whatever they still buffer
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+        if self.recorder is not None:
+            self.recorder.close()
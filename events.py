@@ -0,0 +1,92 @@
+import json
+from collections import deque, namedtuple
+
+# typed game events emitted by ForSale to its sinks, only built when the env has a sink attached
+# values are plain python ints and lists so sinks can serialize them as they are
+
+GameStart = namedtuple('GameStart', 'num_players live_player first_player')
+# a new board was dealt, with every player's coins, money and hand at that point
+Board = namedtuple('Board', 'stage board coins money hands')
+Bid = namedtuple('Bid', 'player action bid')
+Take = namedtuple('Take', 'player card paid')
+# results are (player, card, money) from the lowest card up
+SellRound = namedtuple('SellRound', 'round results')
+IllegalAction = namedtuple('IllegalAction', 'player action')
+GameOver = namedtuple('GameOver', 'winner scores')
+
+# event as a dict with its type under 'event', e.g. {'event': 'Bid', 'player': 1, 'action': 1, 'bid': 3}
+def to_dict(event):
+    return dict(event=type(event).__name__, **event._asdict())
+
+# appends events as json lines, serialized and written once batch_size events are waiting
+class JsonlSink ():
+    def __init__(self, path, batch_size=1024):
+        self.path = path
+        self.batch_size = batch_size
+        self.events = []
+        self.file = None
+
+    def emit(self, event):
+        self.events.append(event)
+        if len(self.events) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.events:
+            return
+        if self.file is None:
+            self.file = open(self.path, 'a')
+        self.file.write(''.join(json.dumps(to_dict(x)) + '\n' for x in self.events))
+        self.file.flush()
+        self.events = []
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+# keeps the last size events in memory, for tests and debugging long runs
+class RingBufferSink ():
+    def __init__(self, size=10000):
+        self.events = deque(maxlen=size)
+
+    def emit(self, event):
+        self.events.append(event)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+# human readable game log printed as it happens, what render_mode='text' attaches
+class ConsoleSink ():
+    def emit(self, event):
+        print(self.format(event))
+
+    def format(self, event):
+        from env import Action, Stage
+
+        if isinstance(event, GameStart):
+            return 'New game: {} players, P{} starts'.format(event.num_players, event.first_player)
+        if isinstance(event, Board):
+            players = ' | '.join('P{} $: {} M: {} H: {}'.format(i, event.coins[i], event.money[i], hand) for i, hand in enumerate(event.hands))
+            return '{} {} {}\n'.format(Stage(event.stage).name, event.board, players)
+        if isinstance(event, Bid):
+            return 'P{} performs {} Total Bid {}\n'.format(event.player, Action(event.action).name, event.bid)
+        if isinstance(event, Take):
+            return 'P{} performs {} Card {} Paid {}\n'.format(event.player, Action.TAKE.name, event.card, event.paid)
+        if isinstance(event, SellRound):
+            return 'Sell Round {}: '.format(event.round) + ''.join('P{} C:{} M:+{} | '.format(*x) for x in event.results) + '\n'
+        if isinstance(event, IllegalAction):
+            return 'P{} illegal action {}'.format(event.player, event.action)
+        if isinstance(event, GameOver):
+            return 'Player P{} wins the game! {}'.format(event.winner, event.scores)
+        return str(event)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
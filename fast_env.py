@@ -0,0 +1,315 @@
+import gym
+import numpy as np
+
+from env import Action, ForSale, Stage
+
+# same rules and api as ForSale (reset, step, get_action_mask, agents' info) with the game kept in plain python ints
+# hands are bitsets over their slots, seats still bidding a bitset over the seats,
+# decks are dealt order lists with a cursor since the money deck has repeated values
+# seeds deal the same games as ForSale so both engines play the same moves, there are no render, profile or sinks
+# the info 'observation' and 'property' are only built when an agent reads them, from the state at that point
+# with seat_observations every agent's info observation is from its own seat instead of the live player's
+
+class _Info (dict):
+    __slots__ = ('env', 'player_num')
+
+    # missing keys are the ones that cost a list or array to build
+    def __missing__(self, key):
+        if key == 'observation':
+            value = self.env._build_observation(self.player_num if self.env.seat_observations else None)
+        elif key == 'property':
+            value = list(self.env.property[self.player_num])
+        else:
+            raise KeyError(key)
+        self[key] = value
+        return value
+
+class FastForSale ():
+    __slots__ = (
+        'players', 'num_players', 'live_player', 'cards_per_player', 'rng', 'agent_actions',
+        'property_deck', 'money_deck', 'property_cursor', 'money_cursor',
+        'coins', 'money', 'bid', 'bidding_bits', 'property', 'hand_bits', 'sell_property',
+        'stage', 'board', 'curr_player', 'last_bid', 'num_buy_round', 'num_buy_property',
+        'num_sell_round', 'num_sell_property', 'is_game_over', 'reward', 'action_log',
+        'action_mask', 'info', 'observation', 'observation_space', 'action_space', 'obs_mode',
+        'seat_observations'
+    )
+
+    NUM_CARDS = ForSale.NUM_CARDS
+    NUM_COINS = ForSale.NUM_COINS
+    BUY_ACTION_MASKS = ForSale.BUY_ACTION_MASKS
+    SELL_ACTION_MASKS = ForSale.SELL_ACTION_MASKS
+
+    def __init__(self, players, live_player=-1, obs_mode='raw', seat_observations=False):
+        if obs_mode not in ForSale.OBS_MODES:
+            raise Exception('obs mode must be one of {}'.format(', '.join(ForSale.OBS_MODES)))
+        self.num_players = len(players)
+        self.players = players
+        self.live_player = live_player
+        self.obs_mode = obs_mode
+        self.seat_observations = seat_observations
+        self.observation_space = ForSale.get_observation_space(self.num_players, obs_mode)
+        self.action_space = gym.spaces.Discrete(len(Action))
+        self.rng = np.random.default_rng()
+        self.reset(options={'init': True})
+
+    def reset(self, return_info=False, seed=None, options=None):
+        if self.num_players < 3 or self.num_players > 6:
+            raise Exception('number of players must be 3-6')
+        n = self.num_players
+        self.agent_actions = [getattr(x, 'action', None) for x in self.players]
+        for player in self.players:
+            player.new_game()
+
+        # deal exactly like ForSale, the only numpy calls of a game
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        property_deck = np.arange(1, 31)
+        money_deck = np.sort(np.concatenate([[0, 0], np.arange(2, 16), np.arange(2, 16)]))
+        self.rng.shuffle(property_deck)
+        self.rng.shuffle(money_deck)
+        self.property_deck = property_deck.tolist()
+        self.money_deck = money_deck.tolist()
+        self.property_cursor = len(self.property_deck) - self.NUM_CARDS[n]
+        self.money_cursor = self.property_cursor
+
+        self.cards_per_player = self.NUM_CARDS[n] // n
+        self.coins = [self.NUM_COINS[n]] * n
+        self.money = [0] * n
+        self.bid = [0] * n
+        self.bidding_bits = (1 << n) - 1
+        self.property = [[-1] * self.cards_per_player for _ in range(n)]
+        self.hand_bits = [0] * n
+        self.sell_property = [-1] * n
+
+        self.stage = Stage.BUYING
+        self.num_buy_round = 0
+        self.num_buy_property = 0
+        self.board = self._get_next_cards()
+        self.curr_player = int(self.rng.integers(n))
+        self.last_bid = 0
+        self.num_sell_round = 0
+        self.num_sell_property = 0
+        self.is_game_over = False
+        self.reward = 0
+        self.action_log = []
+        self._get_info()
+
+        if not (options and options['init']):
+            self._auto_play()
+        self._get_observation()
+
+        if return_info:
+            return self.observation, self.info
+        return self.observation
+
+    def step(self, action):
+        self.reward = 0
+        self._execute_action(action)
+        self._auto_play()
+        self._get_observation()
+        return (self.observation, float(self.reward), self.is_game_over, self.info)
+
+    def _execute_action(self, action):
+        action = int(action)
+        self.action_log.append(action)
+        if self.stage == Stage.BUYING:
+            self._resolve_buy_action(action)
+        else:
+            self._resolve_sell_action(action)
+        self._get_info()
+
+    def _auto_play(self):
+        while not self.is_game_over and (self.live_player == -1 or self.curr_player != self.live_player):
+            self._execute_action(self.agent_actions[self.curr_player](self.info))
+        if self.is_game_over:
+            self._sync_players()
+
+    # agents keep their Player fields, written back once the game is over
+    def _sync_players(self):
+        for i, player in enumerate(self.players):
+            player.coins = self.coins[i]
+            player.money = self.money[i]
+            player.bid = self.bid[i]
+            player.is_bidding = bool(self.bidding_bits >> i & 1)
+            player.property = list(self.property[i])
+            player.hand_bits = self.hand_bits[i]
+            player.sell_property = self.sell_property[i]
+
+    def _get_next_cards(self):
+        n = self.num_players
+        if self.stage == Stage.BUYING:
+            cards = self.property_deck[self.property_cursor:self.property_cursor + n]
+            self.property_cursor += n
+        else:
+            cards = self.money_deck[self.money_cursor:self.money_cursor + n]
+            self.money_cursor += n
+        return tuple(sorted(cards))
+
+    def _get_info(self):
+        self.action_mask = self._lookup_action_mask(self.curr_player)
+        info = _Info(
+            stage=self.stage,
+            last_bid=self.last_bid,
+            num_buy_property=self.num_buy_property,
+            num_sell_round=self.num_sell_round,
+            num_players=self.num_players,
+            action_mask=self.action_mask,
+            board=self.board,
+            action_log=self.action_log,
+            get_state=self.get_state
+        )
+        info.env = self
+        info.player_num = self.curr_player
+        self.info = info
+
+    # observation handed back to the live player, its info shares it instead of building another
+    def _get_observation(self):
+        self.observation = self._build_observation()
+        self.info['observation'] = self.observation
+
+    # same layout as ForSale, board data then player data with the live player, or the given seat, first
+    def _build_observation(self, seat=None):
+        n = self.num_players
+        seat = self.live_player if seat is None else seat
+        if self.obs_mode != 'raw':
+            return self._build_scaled_observation(seat)
+        obs = [int(self.stage), self.last_bid]
+        obs += self.board if self.board else [0] * n
+        for k in range(n):
+            i = (seat + k) % n
+            obs += [i, self.coins[i], self.money[i], self.bidding_bits >> i & 1, self.bid[i]]
+            obs += self.property[i]
+        return np.array(obs, dtype=self.observation_space.dtype)
+
+    # scaled modes through ForSale's scale helpers
+    def _build_scaled_observation(self, seat):
+        n = self.num_players
+        obs = ForSale.scale_board(n, self.stage, self.last_bid, self.board)
+        for k in range(n):
+            i = (seat + k) % n
+            obs += ForSale.scale_player(n, self.obs_mode, self.coins[i], self.money[i], self.bidding_bits >> i & 1, self.bid[i], self.property[i])
+        return np.array(obs, dtype=self.observation_space.dtype)
+
+    def get_action_mask(self, player_num=None):
+        if player_num == None:
+            player_num = self.live_player
+        if player_num == self.curr_player:
+            return self.action_mask
+        return self._lookup_action_mask(player_num)
+
+    def _lookup_action_mask(self, player_num):
+        if self.stage == Stage.BUYING:
+            return self.BUY_ACTION_MASKS[self.last_bid, self.coins[player_num], int(self._is_last_card())]
+        return self.SELL_ACTION_MASKS[self.hand_bits[player_num]]
+
+    # compact copy of the game for search agents, see game_state.GameState
+    def get_state(self):
+        from game_state import GameState
+
+        state = GameState.__new__(GameState)
+        state.num_players = self.num_players
+        state.live_player = self.live_player
+        state.property_deck = tuple(self.property_deck)
+        state.money_deck = tuple(self.money_deck)
+        state.history = []
+        state._load((
+            self.coins[:], self.money[:], self.bid[:], [bool(self.bidding_bits >> i & 1) for i in range(self.num_players)],
+            self.sell_property[:], [x[:] for x in self.property], self.board, self.property_cursor, self.money_cursor,
+            self.stage, self.curr_player, self.last_bid, self.num_buy_round, self.num_buy_property,
+            self.num_sell_round, self.num_sell_property, self.is_game_over, self.reward
+        ))
+        return state
+
+    def _resolve_illegal_action(self, action):
+        if self.curr_player == self.live_player:
+            self.reward = -1
+            self.is_game_over = True
+
+    def _is_last_card(self):
+        return self.num_buy_property == self.num_players - 1
+
+    def _resolve_buy_action(self, action):
+        i = self.curr_player
+        n = self.num_players
+
+        if action == Action.TAKE:
+            # pay full bid if last card else pay half rounded up
+            self.coins[i] -= self.bid[i] if self._is_last_card() else (self.bid[i] + 1) // 2
+            self.bid[i] = 0
+            self.bidding_bits &= ~(1 << i % n)
+            card = self.board[self.num_buy_property]
+            self.property[i][self.num_buy_round] = card
+            self.hand_bits[i] |= 1 << self.num_buy_round
+            self.num_buy_property += 1
+        elif action >= Action.BID_1 and action <= Action.BID_2:
+            if self.last_bid + action > self.coins[i] or self._is_last_card():
+                return self._resolve_illegal_action(action)
+            self.bid[i] = self.last_bid + action
+            self.last_bid = self.bid[i]
+        else:
+            return self._resolve_illegal_action(action)
+
+        if self.num_buy_property == n:
+            # check for next stage or next round, last person to take starts next buy round
+            if self.property_cursor == len(self.property_deck):
+                self.stage = Stage.SELLING
+                self.curr_player = self.live_player
+                for hand in self.property:
+                    hand.sort()
+                # every slot is full once sorted
+                self.hand_bits = [(1 << self.cards_per_player) - 1] * n
+            else:
+                self.num_buy_round += 1
+                self.bidding_bits = (1 << n) - 1
+            self.num_buy_property = 0
+            self.last_bid = 0
+            self.board = self._get_next_cards()
+        else:
+            # cycle to next active player in round
+            i %= n
+            while True:
+                i = i + 1 if i + 1 < n else 0
+                if self.bidding_bits >> i & 1:
+                    self.curr_player = i
+                    break
+
+    def _resolve_sell_action(self, action):
+        i = self.curr_player
+        n = self.num_players
+        sell_index = action - Action.SELL_1
+        if sell_index < 0 or sell_index >= self.cards_per_player or not self.hand_bits[i] >> sell_index & 1:
+            return self._resolve_illegal_action(action)
+        self.sell_property[i] = sell_index
+        self.num_sell_property += 1
+
+        if self.num_sell_property == n:
+            # lowest card gets lowest money
+            selected_cards = sorted((self.property[j][self.sell_property[j]], j) for j in range(n))
+            for j in range(n):
+                self.hand_bits[j] &= ~(1 << self.sell_property[j])
+                self.property[j][self.sell_property[j]] = -1
+                self.sell_property[j] = -1
+            for rank, (_, j) in enumerate(selected_cards):
+                self.money[j] += self.board[rank]
+
+            self.num_sell_round += 1
+            self.num_sell_property = 0
+            self.curr_player = self.live_player
+
+            if self.money_cursor == len(self.money_deck):
+                self.is_game_over = True
+                self.board = ()
+                # winner has most money, tiebreaker is leftover coins then later seat like ForSale's stable sort
+                winner = max(range(n), key=lambda j : (self.coins[j] + self.money[j], self.coins[j], j))
+                self.reward = 1 if winner == self.live_player else -1
+            else:
+                self.board = self._get_next_cards()
+        else:
+            # cycle to next player for card selection
+            i %= n
+            while True:
+                i = i + 1 if i + 1 < n else 0
+                if self.sell_property[i] == -1:
+                    self.curr_player = i
+                    break
@@ -0,0 +1,265 @@
+import copy
+import time
+
+from env import Action, Stage, ForSale
+
+# compact copy of a ForSale game in plain python values, without the agents or rendering
+# rules match ForSale, apply advances one action of the current player and undo steps it back
+class GameState ():
+    __slots__ = (
+        'num_players', 'live_player', 'property_deck', 'money_deck', 'history',
+        'coins', 'money', 'bid', 'is_bidding', 'sell_property', 'property', 'board',
+        'property_cursor', 'money_cursor', 'stage', 'curr_player', 'last_bid',
+        'num_buy_round', 'num_buy_property', 'num_sell_round', 'num_sell_property',
+        'is_game_over', 'reward'
+    )
+
+    def __init__(self, env):
+        self.num_players = env.num_players
+        self.live_player = env.live_player
+        # decks never change during a game so every copy shares them
+        self.property_deck = tuple(int(x) for x in env.property_deck)
+        self.money_deck = tuple(int(x) for x in env.money_deck)
+        self.history = []
+
+        self.coins = [int(x.coins) for x in env.players]
+        self.money = [int(x.money) for x in env.players]
+        self.bid = [int(x.bid) for x in env.players]
+        self.is_bidding = [x.is_bidding for x in env.players]
+        self.sell_property = [int(x.sell_property) for x in env.players]
+        self.property = [[int(c) for c in x.property] for x in env.players]
+        self.board = tuple(int(x) for x in env.board)
+
+        self.property_cursor = env.property_cursor
+        self.money_cursor = env.money_cursor
+        self.stage = env.stage
+        self.curr_player = int(env.curr_player)
+        self.last_bid = int(env.last_bid)
+        self.num_buy_round = env.num_buy_round
+        self.num_buy_property = env.num_buy_property
+        self.num_sell_round = env.num_sell_round
+        self.num_sell_property = env.num_sell_property
+        self.is_game_over = env.is_game_over
+        self.reward = env.reward
+
+    # mutable part of the state as a tuple, safe to keep after the state moves on
+    def snapshot(self):
+        return (
+            self.coins[:], self.money[:], self.bid[:], self.is_bidding[:], self.sell_property[:],
+            [x[:] for x in self.property], self.board, self.property_cursor, self.money_cursor,
+            self.stage, self.curr_player, self.last_bid, self.num_buy_round, self.num_buy_property,
+            self.num_sell_round, self.num_sell_property, self.is_game_over, self.reward
+        )
+
+    # snapshot can be restored any number of times
+    def restore(self, snapshot):
+        self._load(snapshot)
+        self.coins = self.coins[:]
+        self.money = self.money[:]
+        self.bid = self.bid[:]
+        self.is_bidding = self.is_bidding[:]
+        self.sell_property = self.sell_property[:]
+        self.property = [x[:] for x in self.property]
+
+    def _load(self, snapshot):
+        (
+            self.coins, self.money, self.bid, self.is_bidding, self.sell_property,
+            self.property, self.board, self.property_cursor, self.money_cursor,
+            self.stage, self.curr_player, self.last_bid, self.num_buy_round, self.num_buy_property,
+            self.num_sell_round, self.num_sell_property, self.is_game_over, self.reward
+        ) = snapshot
+
+    # independent state sharing only the decks, undo history is not carried over
+    def clone(self):
+        state = GameState.__new__(GameState)
+        state.num_players = self.num_players
+        state.live_player = self.live_player
+        state.property_deck = self.property_deck
+        state.money_deck = self.money_deck
+        state.history = []
+        state._load(self.snapshot())
+        return state
+
+    # rollouts that never undo can skip saving the snapshot
+    def apply(self, action, undoable=True):
+        if undoable:
+            self.history.append(self.snapshot())
+        if self.stage == Stage.BUYING:
+            self._resolve_buy_action(action)
+        else:
+            self._resolve_sell_action(action)
+
+    def undo(self):
+        self._load(self.history.pop())
+
+    # clone with every unseen card reshuffled, one possible order of the hidden cards
+    # cards removed from smaller games are unseen too, so they are shuffled together with the undealt ones
+    # cards other players already picked this sell round are hidden from player_num (default the current player),
+    # so their picks are re-sampled from their hands
+    def determinize(self, rng, player_num=None):
+        if player_num == None:
+            player_num = self.curr_player % self.num_players
+
+        state = self.clone()
+        num_removed = len(self.property_deck) - ForSale.NUM_CARDS[self.num_players]
+        state.property_deck = self._shuffle_unseen(self.property_deck, num_removed, self.property_cursor, rng)
+        state.money_deck = self._shuffle_unseen(self.money_deck, num_removed, self.money_cursor, rng)
+        if state.stage == Stage.SELLING:
+            for i in range(self.num_players):
+                if i != player_num and state.sell_property[i] != -1:
+                    state.sell_property[i] = rng.choice([k for k, card in enumerate(state.property[i]) if card != -1])
+        return state
+
+    def _shuffle_unseen(self, deck, num_removed, cursor, rng):
+        unseen = list(deck[:num_removed] + deck[cursor:])
+        rng.shuffle(unseen)
+        return tuple(unseen[:num_removed]) + deck[num_removed:cursor] + tuple(unseen[num_removed:])
+
+    def legal_actions(self, player_num=None):
+        if player_num == None:
+            player_num = self.curr_player
+
+        if self.stage == Stage.BUYING:
+            moves = [int(Action.TAKE)]
+            if not self._is_last_card():
+                for i in range(Action.BID_1, Action.BID_2 + 1):
+                    if self.last_bid + i <= self.coins[player_num]:
+                        moves.append(i)
+            return moves
+
+        return [Action.SELL_1 + i for i, card in enumerate(self.property[player_num]) if card != -1]
+
+    def scores(self):
+        return [self.coins[i] + self.money[i] for i in range(self.num_players)]
+
+    # most money wins, leftover coins then later seat break ties like ForSale's stable sort
+    def winner(self):
+        return max(range(self.num_players), key=lambda i : (self.coins[i] + self.money[i], self.coins[i], i))
+
+    def _get_next_cards(self):
+        if self.stage == Stage.BUYING:
+            cards = self.property_deck[self.property_cursor:self.property_cursor + self.num_players]
+            self.property_cursor += self.num_players
+        else:
+            cards = self.money_deck[self.money_cursor:self.money_cursor + self.num_players]
+            self.money_cursor += self.num_players
+        return tuple(sorted(cards))
+
+    def _resolve_illegal_action(self):
+        if self.curr_player == self.live_player:
+            self.reward = -1
+            self.is_game_over = True
+
+    def _is_last_card(self):
+        return self.num_buy_property == self.num_players - 1
+
+    def _resolve_buy_action(self, action):
+        i = self.curr_player
+
+        if action == Action.TAKE:
+            # pay full bid if last card else pay half rounded up
+            self.coins[i] -= self.bid[i] if self._is_last_card() else (self.bid[i] + 1) // 2
+            self.bid[i] = 0
+            self.is_bidding[i] = False
+            self.property[i][self.num_buy_round] = self.board[self.num_buy_property]
+            self.num_buy_property += 1
+        elif action >= Action.BID_1 and action <= Action.BID_2:
+            if self.last_bid + action > self.coins[i] or self._is_last_card():
+                return self._resolve_illegal_action()
+            self.bid[i] = self.last_bid + int(action)
+            self.last_bid = self.bid[i]
+        else:
+            return self._resolve_illegal_action()
+
+        if self.num_buy_property == self.num_players:
+            # check for next stage or next round, last person to take starts next buy round
+            if self.property_cursor == len(self.property_deck):
+                self.stage = Stage.SELLING
+                self.curr_player = self.live_player
+                for hand in self.property:
+                    hand.sort()
+            else:
+                self.num_buy_round += 1
+                self.is_bidding = [True] * self.num_players
+            self.num_buy_property = 0
+            self.last_bid = 0
+            self.board = self._get_next_cards()
+        else:
+            # cycle to next active player in round
+            while True:
+                i = (i + 1) % self.num_players
+                if self.is_bidding[i]:
+                    self.curr_player = i
+                    break
+
+    def _resolve_sell_action(self, action):
+        i = self.curr_player
+        sell_index = action - Action.SELL_1
+        if sell_index < 0 or sell_index >= len(self.property[i]) or self.property[i][sell_index] == -1:
+            return self._resolve_illegal_action()
+        self.sell_property[i] = int(sell_index)
+        self.num_sell_property += 1
+
+        if self.num_sell_property == self.num_players:
+            # lowest card gets lowest money
+            selected_cards = sorted((self.property[j][self.sell_property[j]], j) for j in range(self.num_players))
+            for j in range(self.num_players):
+                self.property[j][self.sell_property[j]] = -1
+                self.sell_property[j] = -1
+            for rank, (_, j) in enumerate(selected_cards):
+                self.money[j] += self.board[rank]
+
+            self.num_sell_round += 1
+            self.num_sell_property = 0
+            self.curr_player = self.live_player
+
+            if self.money_cursor == len(self.money_deck):
+                self.is_game_over = True
+                self.board = ()
+                self.reward = 1 if self.winner() == self.live_player else -1
+            else:
+                self.board = self._get_next_cards()
+        else:
+            # cycle to next player for card selection
+            while True:
+                i = (i + 1) % self.num_players
+                if self.sell_property[i] == -1:
+                    self.curr_player = i
+                    break
+
+# compare branching a game through GameState against deepcopy of the whole env
+def benchmark(num_players=4, num_iters=10000):
+    from agents.value_agent import ValueAgent
+
+    players = [ValueAgent(i) for i in range(num_players)]
+    env = ForSale(players, live_player=0)
+    env.reset(seed=0)
+    state = GameState(env)
+    action = state.legal_actions()[0]
+
+    def rate(fn, iters):
+        start = time.perf_counter()
+        for _ in range(iters):
+            fn()
+        return round(iters / (time.perf_counter() - start))
+
+    def apply_undo():
+        state.apply(action)
+        state.undo()
+
+    snapshot = state.snapshot()
+    results = {
+        'deepcopy': rate(lambda : copy.deepcopy(env), max(num_iters // 10, 1)),
+        'clone': rate(state.clone, num_iters),
+        'snapshot': rate(state.snapshot, num_iters),
+        'restore': rate(lambda : state.restore(snapshot), num_iters),
+        'apply_undo': rate(apply_undo, num_iters)
+    }
+    print('Num players: {} | per second: {}'.format(num_players, results))
+    return results
+
+if __name__ == "__main__":
+    benchmark(3)
+    benchmark(4)
+    benchmark(5)
+    benchmark(6)
@@ -0,0 +1,76 @@
+import multiprocessing as mp
+import queue
+import time
+
+import numpy as np
+
+# handle used by an RLModelAgent to ask the server for actions, picklable so it can be sent to worker processes
+class InferenceClient ():
+    def __init__(self, client_id, request_queue, response_queue):
+        self.client_id = client_id
+        self.request_queue = request_queue
+        self.response_queue = response_queue
+
+    def predict(self, path, observation, action_mask):
+        self.request_queue.put((self.client_id, path, np.asarray(observation), np.asarray(action_mask)))
+        return self.response_queue.get()
+
+def _serve(request_queue, response_queues, models, max_batch, max_wait):
+    from agents.rl_agent import load_model
+
+    # every policy is loaded once no matter how many envs or agents use it
+    loaded = {path: load_model(algo, path) for path, algo in models.items()}
+    is_running = True
+    while is_running:
+        request = request_queue.get()
+        if request is None:
+            break
+
+        # collect more requests until the batch is full or the wait window closes
+        requests = [request]
+        deadline = time.perf_counter() + max_wait
+        while len(requests) < max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = request_queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                is_running = False
+                break
+            requests.append(request)
+
+        # one forward pass per model for the whole batch
+        by_path = {}
+        for request in requests:
+            by_path.setdefault(request[1], []).append(request)
+        for path, path_requests in by_path.items():
+            observations = np.stack([x[2] for x in path_requests])
+            if models[path] == 'ppo_mask':
+                action_masks = np.stack([x[3] for x in path_requests])
+                actions, _ = loaded[path].predict(observations, action_masks=action_masks)
+            else:
+                actions, _ = loaded[path].predict(observations)
+            for request, action in zip(path_requests, np.reshape(actions, -1)):
+                response_queues[request[0]].put(int(action))
+
+# separate process holding the opponent policies, batches predictions from many envs and workers
+# models maps each model path to its algo, clients must be created before the worker processes start
+class InferenceServer ():
+    def __init__(self, models, num_clients, max_batch=64, max_wait=0.002, start_method=None):
+        if start_method is None:
+            start_method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+        ctx = mp.get_context(start_method)
+
+        self.request_queue = ctx.Queue()
+        response_queues = [ctx.Queue() for _ in range(num_clients)]
+        self.clients = [InferenceClient(i, self.request_queue, x) for i, x in enumerate(response_queues)]
+        args = (self.request_queue, response_queues, dict(models), max_batch, max_wait)
+        self.process = ctx.Process(target=_serve, args=args, daemon=True)
+        self.process.start()
+
+    def close(self):
+        self.request_queue.put(None)
+        self.process.join()
@@ -0,0 +1,133 @@
+import json
+import multiprocessing as mp
+import os
+
+from stable_baselines3.common.callbacks import BaseCallback
+
+# self play league, the learner is snapshotted into a pool dir and league agents pick their opponent from it every game
+# pool.json lists the snapshots with the latest learner's win rate against each, written only by the evaluator process
+# so the learner never waits on evaluation games
+
+POOL_FILE = 'pool.json'
+
+# snapshots of a league dir, re-read whenever the evaluator rewrites the pool file
+class OpponentPool ():
+    def __init__(self, path):
+        self.path = path
+        self.snapshots = []
+        self.mtime = None
+
+    def refresh(self):
+        file_path = os.path.join(self.path, POOL_FILE)
+        try:
+            mtime = os.path.getmtime(file_path)
+        except OSError:
+            return self.snapshots
+        if mtime != self.mtime:
+            with open(file_path) as f:
+                self.snapshots = json.load(f)['snapshots']
+            self.mtime = mtime
+        return self.snapshots
+
+    # snapshots the learner does worst against are picked most, unrated ones count as even
+    def sample(self, rng):
+        snapshots = self.refresh()
+        if not snapshots:
+            return None
+        weights = [(1 - x['win_rate']) ** 2 + 0.01 for x in snapshots]
+        return rng.choices(snapshots, weights=weights)[0]
+
+    def write(self, snapshots):
+        # replace in one step so readers never see a partial file
+        file_path = os.path.join(self.path, POOL_FILE)
+        with open(file_path + '.tmp', 'w') as f:
+            json.dump({'snapshots': snapshots}, f, indent=2)
+        os.replace(file_path + '.tmp', file_path)
+        self.snapshots = snapshots
+
+# win rate of the model at path, in the last seat, against a pool snapshot in every other seat
+# there's no live player so every model sees the game from its own seat
+def evaluate(path, algo, opponent, num_players, games, seed=0, obs_mode='raw'):
+    from agents.rl_agent import RLModelAgent
+    from fast_env import FastForSale
+
+    players = [RLModelAgent(i, algo=opponent['algo'], path=opponent['path']) for i in range(num_players - 1)]
+    players.append(RLModelAgent(num_players - 1, algo=algo, path=path))
+    env = FastForSale(players, obs_mode=obs_mode, seat_observations=True)
+    wins = 0
+    for game in range(games):
+        env.reset(seed=seed + game)
+        winner = max(range(num_players), key=lambda i : (players[i].coins + players[i].money, players[i].coins, i))
+        wins += winner == num_players - 1
+    return wins / max(games, 1)
+
+def _evaluate_worker(snapshot_queue, pool_path, num_players, games, max_size, obs_mode):
+    pool = OpponentPool(pool_path)
+    pool.refresh()
+    while True:
+        snapshot = snapshot_queue.get()
+        if snapshot is None:
+            break
+
+        # newest snapshot stands in for the learner, every rating in the pool is against it
+        snapshots = list(pool.snapshots)
+        for opponent in snapshots:
+            opponent['win_rate'] = evaluate(snapshot['path'], snapshot['algo'], opponent, num_players, games, snapshot['steps'], obs_mode)
+            opponent['games'] = games
+        snapshot['win_rate'] = 1 / num_players
+        snapshot['games'] = 0
+        snapshots.append(snapshot)
+        pool.write(snapshots[-max_size:])
+
+# saves learner snapshots every snapshot_freq steps and hands them to a background evaluator process
+# which rates them against the pool and adds them, league agents in the envs pick them up from the next game
+class LeagueCallback (BaseCallback):
+    def __init__(self, path, num_players, algo='ppo_mask', snapshot_freq=100000, eval_games=50, max_size=20, obs_mode='raw', verbose=0):
+        super().__init__(verbose)
+        self.path = path
+        self.num_players = num_players
+        self.algo = algo
+        self.snapshot_freq = snapshot_freq
+        self.eval_games = eval_games
+        self.max_size = max_size
+        self.obs_mode = obs_mode
+        self.pool = OpponentPool(path)
+        self.last_snapshot = 0
+        self.snapshot_queue = None
+        self.process = None
+
+    def _on_training_start(self):
+        os.makedirs(self.path, exist_ok=True)
+        ctx = mp.get_context('forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn')
+        self.snapshot_queue = ctx.Queue()
+        args = (self.snapshot_queue, self.path, self.num_players, self.eval_games, self.max_size, self.obs_mode)
+        self.process = ctx.Process(target=_evaluate_worker, args=args, daemon=True)
+        self.process.start()
+        # resumed runs count from their checkpoint
+        self.last_snapshot = self.num_timesteps
+        # first snapshot gives league agents an opponent as soon as it's rated
+        if not self.pool.refresh():
+            self.snapshot()
+
+    def _on_step(self):
+        if self.num_timesteps - self.last_snapshot >= self.snapshot_freq:
+            self.snapshot()
+        return True
+
+    def _on_rollout_end(self):
+        snapshots = self.pool.refresh()
+        self.logger.record('league/pool_size', len(snapshots))
+        rated = [x['win_rate'] for x in snapshots if x['games'] > 0]
+        if rated:
+            self.logger.record('league/mean_win_rate', sum(rated) / len(rated))
+
+    def _on_training_end(self):
+        # queued snapshots are still rated and added before training returns
+        self.snapshot_queue.put(None)
+        self.process.join()
+
+    def snapshot(self):
+        self.last_snapshot = self.num_timesteps
+        path = os.path.join(self.path, 'snapshot_{}'.format(self.num_timesteps))
+        self.model.save(path)
+        self.snapshot_queue.put({'path': path, 'algo': self.algo, 'steps': self.num_timesteps})
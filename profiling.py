@@ -0,0 +1,82 @@
+import time
+from collections import defaultdict
+
+from stable_baselines3.common.callbacks import BaseCallback
+
+# opt in timers and call counts for ForSale hot paths, envs without a profile pay nothing
+class EnvProfile ():
+    def __init__(self):
+        self.times = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    # wrap fn so every call adds its wall time and a count under name
+    def timed(self, name, fn):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.times[name] += time.perf_counter() - start
+                self.counts[name] += 1
+        return wrapper
+
+    def reset(self):
+        self.times.clear()
+        self.counts.clear()
+
+# writes env throughput and where the env time goes to the model's tensorboard log after every rollout
+# opponent and env shares need ForSale envs created with profile=True, the rest works with any env
+class EnvProfileCallback (BaseCallback):
+    def __init__(self, verbose=0):
+        super().__init__(verbose)
+        self.start = None
+        self.start_timesteps = 0
+        self.game_lengths = []
+        self.curr_lengths = None
+
+    def _on_rollout_start(self):
+        self.start = time.perf_counter()
+        self.start_timesteps = self.num_timesteps
+        for profile in self._get_profiles():
+            profile.reset()
+
+    def _on_step(self):
+        dones = self.locals['dones']
+        if self.curr_lengths is None:
+            self.curr_lengths = [0] * len(dones)
+        for i, done in enumerate(dones):
+            self.curr_lengths[i] += 1
+            if done:
+                self.game_lengths.append(self.curr_lengths[i])
+                self.curr_lengths[i] = 0
+        return True
+
+    def _on_rollout_end(self):
+        elapsed = time.perf_counter() - self.start
+        self.logger.record('env/steps_per_sec', (self.num_timesteps - self.start_timesteps) / elapsed)
+        if self.game_lengths:
+            self.logger.record('env/mean_game_length', sum(self.game_lengths) / len(self.game_lengths))
+            self.game_lengths = []
+
+        times = defaultdict(float)
+        counts = defaultdict(int)
+        for profile in self._get_profiles():
+            for name, value in profile.times.items():
+                times[name] += value
+                counts[name] += profile.counts[name]
+        if not times:
+            return
+
+        # step covers everything the env does, agent times are the opponents' share of it
+        agent_time = sum(value for name, value in times.items() if name.startswith('agent_'))
+        self.logger.record('env/env_share', (times['step'] + times['reset']) / elapsed)
+        self.logger.record('env/opponent_share', agent_time / elapsed)
+        for name, value in times.items():
+            self.logger.record('profile/{}_us'.format(name), value / counts[name] * 1e6)
+
+    def _get_profiles(self):
+        try:
+            profiles = self.training_env.get_attr('profile')
+        except AttributeError:
+            return []
+        return [x for x in profiles if x is not None]
@@ -0,0 +1,138 @@
+import argparse
+import os
+
+import numpy as np
+
+from env import Action, ForSale, Player
+
+# fixed width game records, <path>.steps holds every action and <path>.index one row per finished game
+# both files are only appended to, readers memmap them so any number of games can be read without loading them
+# the mask is the acting seat's action mask as bits, bit i set when action i was legal
+
+STEP_DTYPE = np.dtype([
+    ('seat', 'u1'),
+    ('stage', 'u1'),
+    ('action', 'u1'),
+    ('reward', 'i1'),
+    ('mask', '<u2')
+])
+INDEX_DTYPE = np.dtype([
+    ('seed', '<u8'),
+    ('start', '<u8'),
+    ('length', '<u2'),
+    ('num_players', 'u1'),
+    ('live_player', 'i1')
+])
+MASK_BITS = 1 << np.arange(len(Action), dtype=np.uint16)
+
+# collects the steps of the game in progress and writes finished games in chunks of at least chunk_size steps
+# a game that never finishes is dropped, so the files only ever hold whole games
+class TrajectoryRecorder ():
+    def __init__(self, path, chunk_size=1 << 16):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.steps = np.zeros(chunk_size, dtype=STEP_DTYPE)
+        self.games = []
+        self.num_buffered = 0
+        self.game = None
+        self.game_steps = []
+
+        # new games continue after the ones already on disk
+        steps_path = path + '.steps'
+        self.num_steps = os.path.getsize(steps_path) // STEP_DTYPE.itemsize if os.path.isfile(steps_path) else 0
+
+    def start_game(self, seed, num_players, live_player):
+        self.game = (seed, num_players, live_player)
+        self.game_steps = []
+
+    def record(self, seat, stage, action, mask, reward):
+        self.game_steps.append((seat, stage, action, reward, int(mask @ MASK_BITS[:len(mask)])))
+
+    def end_game(self):
+        if self.game is None:
+            return
+        seed, num_players, live_player = self.game
+        length = len(self.game_steps)
+        if self.num_buffered + length > len(self.steps):
+            self.steps = np.resize(self.steps, max(2 * len(self.steps), self.num_buffered + length))
+        self.steps[self.num_buffered:self.num_buffered + length] = self.game_steps
+        self.games.append((seed, self.num_steps + self.num_buffered, length, num_players, live_player))
+        self.num_buffered += length
+        self.game = None
+        self.game_steps = []
+
+        if self.num_buffered >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.games:
+            return
+        # steps first, a reader never sees an index row before its steps are on disk
+        with open(self.path + '.steps', 'ab') as f:
+            f.write(self.steps[:self.num_buffered].tobytes())
+        with open(self.path + '.index', 'ab') as f:
+            f.write(np.array(self.games, dtype=INDEX_DTYPE).tobytes())
+        self.num_steps += self.num_buffered
+        self.num_buffered = 0
+        self.games = []
+
+    def close(self):
+        self.flush()
+
+# memmapped view of recorded games, reopen to see games flushed after it was created
+class TrajectoryReader ():
+    def __init__(self, path):
+        self.path = path
+        self.index = self._memmap(path + '.index', INDEX_DTYPE)
+        self.steps = self._memmap(path + '.steps', STEP_DTYPE)
+
+    def _memmap(self, path, dtype):
+        # memmap can't map an empty file
+        if not os.path.isfile(path) or os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r')
+
+    def __len__(self):
+        return len(self.index)
+
+    def game(self, game_num):
+        row = self.index[game_num]
+        return self.steps[int(row['start']):int(row['start']) + int(row['length'])]
+
+    # legal actions of every step of a game as a bool array
+    def masks(self, game_num):
+        return (self.game(game_num)['mask'][:, None] & MASK_BITS) != 0
+
+# seat whose moves are played back from a recorded game
+class ReplayAgent(Player):
+    def __init__(self, player_num):
+        super().__init__(player_num)
+
+# rebuild a recorded game through ForSale up to step (the whole game by default) and return the env in that state
+# every step is checked against the record so a rule change that alters the game raises instead of drifting
+def replay(reader, game_num, step=None, render_mode='none'):
+    row = reader.index[game_num]
+    steps = reader.game(game_num)
+    num_players = int(row['num_players'])
+    env = ForSale([ReplayAgent(i) for i in range(num_players)], live_player=int(row['live_player']), render_mode=render_mode)
+    env.reset(seed=int(row['seed']), options={'init': True})
+
+    masks = reader.masks(game_num)
+    for i in range(len(steps) if step is None else step):
+        is_same_seat = env.curr_player % num_players == steps[i]['seat'] and env.stage == steps[i]['stage']
+        if not is_same_seat or not np.array_equal(env.action_mask, masks[i]):
+            raise Exception('game {} diverged from its record at step {}'.format(game_num, i))
+        env._execute_action(Action(int(steps[i]['action'])))
+    return env
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='replay arguments')
+    parser.add_argument('path')
+    parser.add_argument('--game', type=int, default=0)
+    parser.add_argument('--step', type=int, default=None)
+
+    args = parser.parse_args().__dict__
+    reader = TrajectoryReader(args['path'])
+    print('Games: {} | steps: {}'.format(len(reader), len(reader.steps)))
+    env = replay(reader, args['game'], args['step'], render_mode='text')
+    print(env.players)
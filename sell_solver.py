@@ -0,0 +1,168 @@
+import argparse
+import pickle
+import random
+from collections import OrderedDict
+from functools import lru_cache
+from math import comb
+
+from env import ForSale
+
+# exact solver of the selling stage, every hand is public so only the order of the unseen money cards is uncertain
+# each round is a simultaneous choice game solved to a pure equilibrium by iterated best response, boards of later
+# rounds are averaged over every draw of the unseen money cards (expectimax), payoffs are expected money still to earn
+# positions go in a transposition table keyed by (hands, unseen money), hands are ranked among all cards left in hand
+# since only the order of the properties decides who gets which money card
+
+# distinct boards of size n from the unseen money multiset with their probability and the cards left after them
+@lru_cache(maxsize=4096)
+def _draws(money, n):
+    counts = OrderedDict()
+    for card in money:
+        counts[card] = counts.get(card, 0) + 1
+    values = list(counts)
+    total = comb(len(money), n)
+
+    draws = []
+    def expand(i, left, board, ways):
+        if left == 0:
+            rest = []
+            taken = OrderedDict()
+            for card in board:
+                taken[card] = taken.get(card, 0) + 1
+            for value in values:
+                rest += [value] * (counts[value] - taken.get(value, 0))
+            draws.append((tuple(board), ways / total, tuple(rest)))
+            return
+        if i == len(values):
+            return
+        for k in range(min(left, counts[values[i]]), -1, -1):
+            expand(i + 1, left - k, board + [values[i]] * k, ways * comb(counts[values[i]], k))
+    expand(0, n, [], 1)
+    return draws
+
+def _canonical(hands):
+    ranks = {card: i for i, card in enumerate(sorted(card for hand in hands for card in hand))}
+    return tuple(tuple(ranks[card] for card in hand) for hand in hands)
+
+class SellSolver ():
+    def __init__(self, max_entries=1000000, max_iters=20):
+        self.max_entries = max_entries
+        self.max_iters = max_iters
+        self.table = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # expected money each seat still earns with hands (sorted tuples) and the unseen money cards, before the board is drawn
+    def expected(self, hands, money):
+        if len(hands[0]) == 0:
+            return (0,) * len(hands)
+
+        key = (_canonical(hands), tuple(sorted(money)))
+        values = self.table.get(key)
+        if values is not None:
+            self.hits += 1
+            self.table.move_to_end(key)
+            return values
+        self.misses += 1
+
+        hands = key[0]
+        values = [0] * len(hands)
+        for board, p, rest in _draws(key[1], len(hands)):
+            _, payoffs = self.solve(hands, rest, board)
+            for i, x in enumerate(payoffs):
+                values[i] += p * x
+        values = tuple(values)
+
+        self.table[key] = values
+        if len(self.table) > self.max_entries:
+            self.table.popitem(last=False)
+        return values
+
+    # equilibrium sell profile (index into each sorted hand) and payoffs for a round with board known
+    def solve(self, hands, money, board):
+        num_players = len(hands)
+        board = tuple(sorted(board))
+        payoffs = {}
+
+        def get_payoffs(profile):
+            if profile not in payoffs:
+                cards = [hand[i] for hand, i in zip(hands, profile)]
+                next_hands = tuple(hand[:i] + hand[i + 1:] for hand, i in zip(hands, profile))
+                values = list(self.expected(next_hands, money))
+                # lowest card gets lowest money
+                for rank, j in enumerate(sorted(range(num_players), key=lambda j : cards[j])):
+                    values[j] += board[rank]
+                payoffs[profile] = tuple(values)
+            return payoffs[profile]
+
+        # last round has no choice left
+        profile = (0,) * num_players
+        if len(hands[0]) == 1:
+            return profile, get_payoffs(profile)
+
+        # start from everyone selling their lowest card, then let each seat switch to its best response
+        # until nobody wants to, or keep the last profile if it cycles
+        for _ in range(self.max_iters):
+            changed = False
+            for j in range(num_players):
+                best = profile
+                for i in range(len(hands[j])):
+                    candidate = profile[:j] + (i,) + profile[j + 1:]
+                    if get_payoffs(candidate)[j] > get_payoffs(best)[j]:
+                        best = candidate
+                if best != profile:
+                    profile = best
+                    changed = True
+            if not changed:
+                break
+        return profile, get_payoffs(profile)
+
+    def stats(self):
+        return {'entries': len(self.table), 'hits': self.hits, 'misses': self.misses}
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump(dict(self.table), f)
+
+    def load(self, path):
+        with open(path, 'rb') as f:
+            self.table.update(pickle.load(f))
+        while len(self.table) > self.max_entries:
+            self.table.popitem(last=False)
+
+# sorted hands of every seat and the unseen money cards of a selling stage GameState
+# removed cards are unseen too, drawing the boards from all of them gives the same distribution as the real deck
+def position_from_state(state):
+    hands = tuple(tuple(sorted(card for card in hand if card != -1)) for hand in state.property)
+    num_removed = len(state.money_deck) - ForSale.NUM_CARDS[state.num_players]
+    money = tuple(sorted(state.money_deck[:num_removed] + state.money_deck[state.money_cursor:]))
+    return hands, money
+
+# fill a table offline by solving the selling stage positions of self play games, rounds is how many sell rounds
+# are left when solving starts (None for the agent default), the solver agents buy like value agents
+def generate_table(num_players, num_games, rounds, path, seed=0, max_entries=1000000):
+    from agents.sell_solver_agent import SellSolverAgent
+
+    solver = SellSolver(max_entries=max_entries)
+    players = [SellSolverAgent(i, max_rounds=rounds, solver=solver) for i in range(num_players)]
+    env = ForSale(players)
+    for game in range(num_games):
+        random.seed(seed + game)
+        env.reset(seed=seed + game)
+        if (game + 1) % 100 == 0:
+            print('Games: {} | {}'.format(game + 1, solver.stats()))
+    solver.save(path)
+    print('Saved {} positions to {}'.format(len(solver.table), path))
+    return solver
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='sell solver table arguments')
+    parser.add_argument('--num_players', type=int, default=3)
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=None)
+    parser.add_argument('--out', default='sell_table.pkl')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max_entries', type=int, default=1000000)
+
+    args = parser.parse_args().__dict__
+    generate_table(args['num_players'], args['games'], args['rounds'], args['out'], args['seed'], args['max_entries'])
@@ -0,0 +1,375 @@
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from agents.roster import build_players
+from env import Action, ForSale, Player
+from events import to_dict
+
+# asyncio server running many ForSale tables in one process, seats are remote clients or in-process agents
+# protocol is one json object per line over tcp:
+#   client -> server  {"type": "join"} once, then {"turn_id", "action"} for every turn message
+#   server -> client  {"type": "start", "seat", "num_players", "board"}, {"type": "turn", "turn_id", ...} with the
+#                     info a cpu agent gets, {"type": "event", ...} for every game event, {"type": "timeout"},
+#                     {"type": "illegal", "action"} and {"type": "game_over", "winner", "scores"}
+# replies to an earlier turn_id are dropped so a late answer never counts for the next turn
+# a move that times out or is illegal is replaced by the first legal action, clients rejoin the lobby after a game
+
+# batches model moves from every table into one predict per model, run on a thread pool so the loop never waits on torch
+class ModelBatcher ():
+    def __init__(self, models, workers=1, max_batch=64, max_wait=0.002):
+        from agents.rl_agent import load_model
+
+        self.algos = dict(models)
+        self.models = {path: load_model(algo, path) for path, algo in self.algos.items()}
+        self.executor = ThreadPoolExecutor(workers)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = None
+        self.task = None
+
+    async def predict(self, path, observation, action_mask):
+        if self.task is None:
+            self.requests = asyncio.Queue()
+            self.task = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self.requests.put((path, observation, action_mask, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # collect more requests until the batch is full or the wait window closes
+            requests = [await self.requests.get()]
+            deadline = loop.time() + self.max_wait
+            while len(requests) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    requests.append(await asyncio.wait_for(self.requests.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            by_path = {}
+            for request in requests:
+                by_path.setdefault(request[0], []).append(request)
+            # different models predict in parallel, one model never runs two batches at once
+            paths = list(by_path)
+            results = await asyncio.gather(*[loop.run_in_executor(self.executor, self._predict, x, by_path[x]) for x in paths],
+                                           return_exceptions=True)
+            for path, actions in zip(paths, results):
+                for i, request in enumerate(by_path[path]):
+                    # the table may have timed out and stopped waiting
+                    if request[3].done():
+                        continue
+                    if isinstance(actions, Exception):
+                        request[3].set_exception(actions)
+                    else:
+                        request[3].set_result(int(actions[i]))
+
+    def _predict(self, path, requests):
+        observations = np.stack([x[1] for x in requests])
+        if self.algos[path] == 'ppo_mask':
+            actions, _ = self.models[path].predict(observations, action_masks=np.stack([x[2] for x in requests]))
+        else:
+            actions, _ = self.models[path].predict(observations)
+        return np.reshape(actions, -1)
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        self.executor.shutdown()
+
+# observation from a seat's own view, board then that seat's player data first like the live player in training
+def seat_observation(env, seat):
+    board_len = len(env.obs_buffer) - sum(len(x) for x in env.obs_players)
+    players = [env.obs_players[(seat + i) % env.num_players] for i in range(env.num_players)]
+    return np.concatenate([env.obs_buffer[:board_len]] + players)
+
+# cpu agents that search for seconds a move, their seats think on a thread so other tables and timeouts keep running
+THREADED_AGENTS = 'te'
+
+# in-process agent, threaded seats get a copy of the info since a timed out move keeps thinking while the game moves on
+# each threaded seat has its own thread so an agent never runs two moves at once
+class LocalSeat ():
+    def __init__(self, agent, threaded=False):
+        self.player = agent
+        self.executor = ThreadPoolExecutor(1) if threaded else None
+
+    async def action(self, env, seat):
+        if self.executor is None:
+            return self.player.action(env.info)
+
+        state = env.get_state()
+        info = dict(env.info, observation=env.info['observation'].copy(), property=list(env.info['property']),
+                    action_log=list(env.info['action_log']), get_state=lambda : state)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.player.action, info)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+class ModelSeat ():
+    def __init__(self, player_num, batcher, path):
+        self.player = Player(player_num)
+        self.batcher = batcher
+        self.path = path
+
+    async def action(self, env, seat):
+        return await self.batcher.predict(self.path, seat_observation(env, seat), np.array(env.action_mask))
+
+# connected client, disconnected seats play the first legal action for the rest of the game
+class RemoteSeat ():
+    def __init__(self, reader, writer):
+        self.player = None
+        self.reader = reader
+        self.writer = writer
+        self.is_connected = True
+        self.turn_id = 0
+
+    def send(self, message):
+        if self.is_connected:
+            self.writer.write((json.dumps(message) + '\n').encode())
+
+    async def action(self, env, seat):
+        if not self.is_connected:
+            return None
+        self.turn_id += 1
+        self.send({
+            'type': 'turn',
+            'turn_id': self.turn_id,
+            'seat': seat,
+            'stage': int(env.stage),
+            'last_bid': int(env.last_bid),
+            'num_sell_round': env.num_sell_round,
+            'num_players': env.num_players,
+            'board': [int(x) for x in env.board],
+            'property': [int(x) for x in env.players[seat].property],
+            'action_mask': [bool(x) for x in env.action_mask],
+            'observation': [int(x) for x in seat_observation(env, seat)]
+        })
+        try:
+            await self.writer.drain()
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    self.is_connected = False
+                    return None
+                reply = json.loads(line)
+                if reply.get('turn_id') == self.turn_id:
+                    return reply.get('action')
+        except (ConnectionError, ValueError):
+            self.is_connected = False
+            return None
+
+# forwards the events of a table to its remote seats
+class TableSink ():
+    def __init__(self, seats):
+        self.seats = seats
+
+    def emit(self, event):
+        message = to_dict(event)
+        message['type'] = 'event'
+        for seat in self.seats:
+            seat.send(message)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+class Table ():
+    def __init__(self, seats, move_timeout=10):
+        self.seats = seats
+        self.move_timeout = move_timeout
+        self.remote_seats = [x for x in seats if isinstance(x, RemoteSeat)]
+        self.timeouts = 0
+        self.illegal_actions = 0
+
+    async def play(self, seed=None):
+        players = []
+        for i, seat in enumerate(self.seats):
+            if seat.player is None:
+                seat.player = Player(i)
+            seat.player.num = i
+            players.append(seat.player)
+
+        num_players = len(players)
+        sinks = [TableSink(self.remote_seats)] if self.remote_seats else None
+        env = ForSale(players, sinks=sinks)
+        # moves are driven here one at a time instead of by the env's auto play
+        env.reset(seed=seed, options={'init': True})
+        for i, seat in enumerate(self.seats):
+            if isinstance(seat, RemoteSeat):
+                seat.send({'type': 'start', 'seat': i, 'num_players': num_players, 'board': [int(x) for x in env.board]})
+
+        while not env.is_game_over:
+            seat_num = env.curr_player % num_players
+            seat = self.seats[seat_num]
+            try:
+                action = await asyncio.wait_for(seat.action(env, seat_num), self.move_timeout)
+            except asyncio.TimeoutError:
+                action = None
+                self.timeouts += 1
+                if isinstance(seat, RemoteSeat):
+                    seat.send({'type': 'timeout'})
+
+            legal = np.flatnonzero(env.action_mask)
+            if action is None or not isinstance(action, (int, np.integer)) or action not in legal:
+                if action is not None:
+                    self.illegal_actions += 1
+                    if isinstance(seat, RemoteSeat):
+                        seat.send({'type': 'illegal', 'action': action})
+                action = int(legal[0])
+            env._execute_action(Action(int(action)))
+
+        for seat in self.seats:
+            if isinstance(seat, LocalSeat):
+                seat.close()
+
+        # same tiebreak as ForSale, most money then leftover coins
+        winner = sorted(players, key=lambda x : (x.coins + x.money, x.coins))[-1].num
+        scores = [int(x.coins + x.money) for x in players]
+        for seat in self.remote_seats:
+            seat.send({'type': 'game_over', 'winner': winner, 'scores': scores})
+        return winner, scores
+
+# tables take remote seats from the lobby in join order, the other seats are agents built from the agents str
+class GameServer ():
+    def __init__(self, num_players=3, agents='vv', models=[], move_timeout=10, workers=1, max_batch=64, max_wait=0.002):
+        if num_players < 3 or num_players > 6:
+            raise Exception('number of players must be 3-6')
+        if len(agents) > num_players:
+            raise Exception('more agents than seats')
+
+        self.num_players = num_players
+        self.agents = agents
+        self.models = models
+        self.move_timeout = move_timeout
+        self.batcher = ModelBatcher({x: 'ppo_mask' for x in models}, workers, max_batch, max_wait) if models else None
+        self.lobby = None
+        self.tables = set()
+        self.games = 0
+
+    # model seats go through the batcher, other letters are the usual cpu agents
+    def build_seats(self, player_num=0):
+        seats = []
+        m_count = 0
+        for agent in self.agents:
+            if agent == 'm':
+                seats.append(ModelSeat(player_num, self.batcher, self.models[m_count]))
+                m_count += 1
+            else:
+                seats.append(LocalSeat(build_players(agent, player_num=player_num)[0], threaded=agent in THREADED_AGENTS))
+            player_num += 1
+        return seats
+
+    async def play_table(self, seats, seed=None):
+        table = Table(seats, self.move_timeout)
+        result = await table.play(seed)
+        self.games += 1
+        return result
+
+    async def _handle_client(self, reader, writer):
+        line = await reader.readline()
+        if not line or json.loads(line).get('type') != 'join':
+            writer.close()
+            return
+        await self.lobby.put(RemoteSeat(reader, writer))
+
+    async def _match(self):
+        num_remote = self.num_players - len(self.agents)
+        while True:
+            remote_seats = []
+            while len(remote_seats) < num_remote:
+                seat = await self.lobby.get()
+                if seat.is_connected:
+                    remote_seats.append(seat)
+            task = asyncio.get_running_loop().create_task(self._play_remote(remote_seats))
+            self.tables.add(task)
+            task.add_done_callback(self.tables.discard)
+
+    async def _play_remote(self, remote_seats):
+        seats = remote_seats + self.build_seats(len(remote_seats))
+        await self.play_table(seats)
+        for seat in remote_seats:
+            if seat.is_connected:
+                seat.player = None
+                await self.lobby.put(seat)
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        self.lobby = asyncio.Queue()
+        server = await asyncio.start_server(self._handle_client, host, port)
+        match_task = asyncio.get_running_loop().create_task(self._match())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            match_task.cancel()
+
+    # agent only tables, num_tables at a time until games are played, e.g. to load test the batcher
+    async def run_local(self, num_tables, games, seed=0):
+        if len(self.agents) != self.num_players:
+            raise Exception('local tables need an agent for every seat')
+        results = []
+        next_game = 0
+
+        async def run_table():
+            nonlocal next_game
+            while next_game < games:
+                game = next_game
+                next_game += 1
+                results.append(await self.play_table(self.build_seats(), seed + game))
+
+        await asyncio.gather(*[run_table() for _ in range(num_tables)])
+        return results
+
+    def close(self):
+        if self.batcher is not None:
+            self.batcher.close()
+
+# remote client playing with a cpu agent, the reference for external bots
+async def play_remote(agent, host='127.0.0.1', port=8765, games=1):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write((json.dumps({'type': 'join'}) + '\n').encode())
+    results = []
+    while len(results) < games:
+        line = await reader.readline()
+        if not line:
+            break
+        message = json.loads(line)
+        if message['type'] == 'turn':
+            message['action_mask'] = np.array(message['action_mask'])
+            message['observation'] = np.array(message['observation'])
+            reply = {'turn_id': message['turn_id'], 'action': int(agent.action(message))}
+            writer.write((json.dumps(reply) + '\n').encode())
+            await writer.drain()
+        elif message['type'] == 'game_over':
+            results.append(message)
+    writer.close()
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='game server arguments')
+    parser.add_argument('--num_players', type=int, default=3)
+    parser.add_argument('--agents', default='vv')
+    parser.add_argument('--models', nargs='*', default=[])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--move_timeout', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=1)
+
+    args = parser.parse_args().__dict__
+    if args['agents'].count('m') != len(args['models']):
+        raise Exception('must have models equal to amount of model agents')
+
+    server = GameServer(args['num_players'], args['agents'], args['models'], args['move_timeout'], args['workers'])
+    try:
+        asyncio.run(server.serve(args['host'], args['port']))
+    finally:
+        server.close()
@@ -0,0 +1,159 @@
+import multiprocessing as mp
+
+import gym
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+
+from env import Action, ForSale
+from inference import InferenceServer
+
+# shared buffers of every worker, the pipes only carry commands and the infos of finished games
+class SharedBuffers ():
+    def __init__(self, ctx, num_envs, observation_space):
+        self.num_envs = num_envs
+        self.obs_shape = (num_envs,) + observation_space.shape
+        self.obs_dtype = np.dtype(observation_space.dtype)
+        self.raw_obs = ctx.RawArray('B', int(np.prod(self.obs_shape)) * self.obs_dtype.itemsize)
+        self.raw_masks = ctx.RawArray('B', num_envs * len(Action))
+        self.raw_rewards = ctx.RawArray('f', num_envs)
+        self.raw_dones = ctx.RawArray('B', num_envs)
+        self.raw_actions = ctx.RawArray('q', num_envs)
+
+    # numpy views over the raw arrays, rebuilt in each process
+    def views(self):
+        obs = np.frombuffer(self.raw_obs, dtype=self.obs_dtype).reshape(self.obs_shape)
+        masks = np.frombuffer(self.raw_masks, dtype=np.bool_).reshape(self.num_envs, len(Action))
+        rewards = np.frombuffer(self.raw_rewards, dtype=np.float32)
+        dones = np.frombuffer(self.raw_dones, dtype=np.bool_)
+        actions = np.frombuffer(self.raw_actions, dtype=np.int64)
+        return obs, masks, rewards, dones, actions
+
+def _worker(remote, parent_remote, index, agents, models, buffers, client, league, obs_mode):
+    # each worker loads its own agents, model and value agents can't be shared between processes
+    from agents.rl_agent import RLTrainingAgent
+    from agents.roster import build_players
+
+    parent_remote.close()
+    obs, masks, rewards, dones, actions = buffers.views()
+    players = build_players(agents, models, client=client, league=league)
+    live_player = len(players)
+    players.append(RLTrainingAgent(live_player))
+    env = ForSale(players, live_player=live_player, obs_mode=obs_mode)
+
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == 'step':
+                observation, reward, done, _ = env.step(int(actions[index]))
+                info = None
+                if done:
+                    info = {'terminal_observation': observation}
+                    observation = env.reset()
+                obs[index] = observation
+                masks[index] = env.get_action_mask()
+                rewards[index] = reward
+                dones[index] = done
+                remote.send(info)
+            elif cmd == 'reset':
+                obs[index] = env.reset(seed=data)
+                masks[index] = env.get_action_mask()
+                remote.send(None)
+            elif cmd == 'close':
+                remote.close()
+                break
+    except KeyboardInterrupt:
+        pass
+
+# runs one ForSale game per process, observations and masks come back through shared memory
+# with shared_inference the model agents of every worker are served by one batching inference server
+class SubprocForSale (VecEnv):
+    def __init__(self, agents, models=[], num_envs=8, start_method=None, shared_inference=False, league=None, obs_mode='raw'):
+        num_players = len(agents) + 1
+        if num_players < 3 or num_players > 6:
+            raise Exception('number of players must be 3-6')
+
+        super().__init__(num_envs, ForSale.get_observation_space(num_players, obs_mode), gym.spaces.Discrete(len(Action)))
+        if start_method is None:
+            # forkserver is safer than fork once torch is loaded, same default as stable baselines
+            start_method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+        ctx = mp.get_context(start_method)
+
+        self.buffers = SharedBuffers(ctx, num_envs, self.observation_space)
+        self.obs, self.masks, self.rewards, self.dones, self.actions = self.buffers.views()
+        self.seeds = [None] * num_envs
+        self.waiting = False
+        self.closed = False
+
+        self.server = None
+        clients = [None] * num_envs
+        if shared_inference and len(models) > 0:
+            self.server = InferenceServer({x: 'ppo_mask' for x in models}, num_envs, start_method=start_method)
+            clients = self.server.clients
+
+        self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in range(num_envs)])
+        self.processes = []
+        for i, (work_remote, remote) in enumerate(zip(self.work_remotes, self.remotes)):
+            args = (work_remote, remote, i, agents, models, self.buffers, clients[i], league, obs_mode)
+            process = ctx.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+    # seeds are used on the next reset, after that each env continues its own rng
+    def seed(self, seed=None):
+        self.seeds = [None if seed is None else seed + i for i in range(self.num_envs)]
+        return self.seeds
+
+    def reset(self):
+        for remote, seed in zip(self.remotes, self.seeds):
+            remote.send(('reset', seed))
+        for remote in self.remotes:
+            remote.recv()
+        self.seeds = [None] * self.num_envs
+        return self.obs.copy()
+
+    def step_async(self, actions):
+        self.actions[:] = np.asarray(actions).reshape(self.num_envs)
+        for remote in self.remotes:
+            remote.send(('step', None))
+        self.waiting = True
+
+    def step_wait(self):
+        infos = [remote.recv() or {} for remote in self.remotes]
+        self.waiting = False
+        return self.obs.copy(), self.rewards.copy(), self.dones.copy(), infos
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+        for remote in self.remotes:
+            remote.send(('close', None))
+        for process in self.processes:
+            process.join()
+        if self.server is not None:
+            self.server.close()
+        self.closed = True
+
+    def action_masks(self):
+        return self.masks.copy()
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name)] * len(self._get_indices(indices))
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        indices = list(self._get_indices(indices))
+        if method_name == 'action_masks':
+            # masks are already in shared memory, no round trip to the workers
+            return list(self.action_masks()[indices])
+
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result] * len(indices)
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False] * len(self._get_indices(indices))
@@ -0,0 +1,148 @@
+import itertools
+import json
+import math
+import multiprocessing as mp
+import os
+import random
+
+# hyperparameter sweep of maskable ppo by successive halving
+# the space is a json dict of MaskablePPO kwargs to lists of choices, e.g. {"learning_rate": [3e-4, 1e-4], "n_steps": [512, 2048]}
+# every trial trains min_steps and is rated by its win rate on fixed seeds against each eval roster, the best 1/eta
+# keep training from their saved model to eta times the steps, until one trial is left or max_steps is reached
+# trials of a rung run across a process pool, each worker limited to a number of torch threads
+
+RESULTS_FILE = 'results.tsv'
+
+# every combination when the grid is small enough, otherwise num_trials random picks
+def sample_configs(space, num_trials, seed=0):
+    keys = sorted(space)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*[space[x] for x in keys])]
+    if len(grid) <= num_trials:
+        return grid
+    return random.Random(seed).sample(grid, num_trials)
+
+# win rate of the model in the last seat against a roster str, games are dealt from fixed seeds
+def evaluate(model, roster, num_games, seed=0, obs_mode='raw'):
+    from agents.rl_agent import RLTrainingAgent
+    from agents.roster import build_players
+    from fast_env import FastForSale
+
+    num_players = len(roster) + 1
+    players = build_players(roster)
+    players.append(RLTrainingAgent(num_players - 1))
+    env = FastForSale(players, live_player=num_players - 1, obs_mode=obs_mode)
+
+    wins = 0
+    for game in range(num_games):
+        random.seed(seed + game)
+        observation = env.reset(seed=seed + game)
+        done = env.is_game_over
+        reward = env.reward
+        while not done:
+            action, _ = model.predict(observation, action_masks=env.get_action_mask(), deterministic=True)
+            observation, reward, done, _ = env.step(action)
+        wins += reward == 1
+    return wins / max(num_games, 1)
+
+def _init_worker(cores):
+    import torch
+
+    torch.set_num_threads(cores)
+
+# train a trial up to steps, starting from its last rung's model when it has one
+def _run_trial(trial):
+    from sb3_contrib.common.maskable.policies import MaskableActorCriticPolicy
+    from sb3_contrib.common.wrappers import ActionMasker
+    from sb3_contrib.ppo_mask import MaskablePPO
+
+    from agents.rl_agent import RLTrainingAgent
+    from agents.roster import build_players
+    from env import ForSale
+
+    num_players = len(trial['agents']) + 1
+    players = build_players(trial['agents'])
+    players.append(RLTrainingAgent(num_players - 1))
+    env = ActionMasker(ForSale(players, live_player=num_players - 1, obs_mode=trial['obs_mode']), lambda env : env.get_action_mask())
+    env.reset(seed=trial['seed'])
+
+    if trial['model_path']:
+        model = MaskablePPO.load(trial['model_path'], env=env)
+    else:
+        model = MaskablePPO(MaskableActorCriticPolicy, env, seed=trial['seed'], verbose=0, **trial['params'])
+    model.learn(total_timesteps=trial['steps'] - model.num_timesteps, reset_num_timesteps=False)
+    model_path = os.path.join(trial['out'], 'trial_{}'.format(trial['id']))
+    model.save(model_path)
+
+    win_rates = {x: evaluate(model, x, trial['eval_games'], trial['eval_seed'], trial['obs_mode']) for x in trial['eval_rosters']}
+    return dict(trial, model_path=model_path, steps=model.num_timesteps, win_rates=win_rates,
+                score=sum(win_rates.values()) / len(win_rates))
+
+class Sweep ():
+    def __init__(self, space, out, num_players=3, agents='vv', num_trials=16, min_steps=50000, max_steps=None, eta=3,
+                 eval_rosters=None, eval_games=200, workers=None, cores=1, seed=123, obs_mode='raw'):
+        if len(agents) != num_players - 1:
+            raise Exception('must have agents equal to num_players - 1')
+        if eta < 2:
+            raise Exception('eta must be at least 2')
+
+        self.space = space
+        self.out = out
+        self.num_players = num_players
+        self.agents = agents
+        self.configs = sample_configs(space, num_trials, seed)
+        self.min_steps = int(min_steps)
+        # enough rungs to get down to one trial by default
+        self.max_steps = int(max_steps or min_steps * eta ** math.ceil(math.log(max(len(self.configs), 1), eta)))
+        self.eta = eta
+        self.eval_rosters = eval_rosters or ['v' * (num_players - 1), 'r' * (num_players - 1)]
+        self.eval_games = eval_games
+        self.workers = workers or max(1, mp.cpu_count() // cores)
+        self.cores = cores
+        self.seed = seed
+        self.obs_mode = obs_mode
+        self.results = []
+
+    def run(self):
+        os.makedirs(self.out, exist_ok=True)
+        trials = [{
+            'id': i, 'params': params, 'agents': self.agents, 'seed': self.seed + i, 'model_path': None, 'out': self.out,
+            'eval_rosters': self.eval_rosters, 'eval_games': self.eval_games, 'eval_seed': self.seed, 'obs_mode': self.obs_mode
+        } for i, params in enumerate(self.configs)]
+
+        ctx = mp.get_context('forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn')
+        steps = self.min_steps
+        rung = 0
+        with ctx.Pool(min(self.workers, len(trials)), initializer=_init_worker, initargs=(self.cores,)) as pool:
+            while trials:
+                for trial in trials:
+                    trial['steps'] = steps
+                    trial['rung'] = rung
+                ranked = sorted(pool.map(_run_trial, trials, chunksize=1), key=lambda x : -x['score'])
+                self.results += ranked
+                self.write()
+                self.report(ranked)
+                if len(ranked) == 1 or steps >= self.max_steps:
+                    break
+
+                # copies so the rows already kept in results stay as they were
+                trials = [dict(x) for x in ranked[:max(1, len(ranked) // self.eta)]]
+                steps = min(steps * self.eta, self.max_steps)
+                rung += 1
+        return self.results[-1] if self.results else None
+
+    # one row per trial and rung, best of each rung first
+    def write(self):
+        columns = ['rung', 'id', 'steps', 'score'] + ['win_{}'.format(x) for x in self.eval_rosters] + ['params']
+        with open(os.path.join(self.out, RESULTS_FILE), 'w') as f:
+            f.write('\t'.join(columns) + '\n')
+            for result in self.results:
+                row = [result['rung'], result['id'], result['steps'], '{:.3f}'.format(result['score'])]
+                row += ['{:.3f}'.format(result['win_rates'][x]) for x in self.eval_rosters]
+                row.append(json.dumps(result['params'], sort_keys=True))
+                f.write('\t'.join(str(x) for x in row) + '\n')
+
+    def report(self, ranked):
+        print('Rung {} | {} trials | {} steps'.format(ranked[0]['rung'], len(ranked), ranked[0]['steps']))
+        for result in ranked:
+            win_rates = ' '.join('{} {:.3f}'.format(x, result['win_rates'][x]) for x in self.eval_rosters)
+            print('  trial {:3} | score {:.3f} | {} | {}'.format(result['id'], result['score'], win_rates, json.dumps(result['params'], sort_keys=True)))
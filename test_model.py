@@ -1,12 +1,9 @@
 import argparse
 
 import gym
-from sb3_contrib import MaskablePPO
 from agents.human_agent import HumanAgent
-from agents.random_agent import RandomAgent
-from agents.rl_agent import RLTrainingAgent, RLModelAgent
-from agents.sub_optimal_agent import SubOptimalAgent
-from agents.value_agent import ValueAgent
+from agents.rl_agent import RLTrainingAgent, load_model
+from agents.roster import build_players
 
 import env
 
@@ -43,22 +40,10 @@ if __name__ == '__main__':
 
     # test model is player 0, taken from first path of models array
     # human agent is player 1
-    player_num = 2
-    m_count = 1
-    for agent in agents:
-        if agent == 's':
-            env_kwargs['players'].append(SubOptimalAgent(player_num))
-        elif agent == 'r':
-            env_kwargs['players'].append(RandomAgent(player_num))
-        elif agent == 'v':
-            env_kwargs['players'].append(ValueAgent(player_num))
-        elif agent == 'm':
-            env_kwargs['players'].append(RLModelAgent(player_num, path=models[m_count]))
-            m_count += 1
-        player_num += 1
+    env_kwargs['players'] += build_players(agents, models[1:], player_num=2)
 
     env = gym.make(ENV_NAME, **env_kwargs)
-    model = MaskablePPO.load(models[0])
+    model = load_model('ppo_mask', models[0])
     obs = env.reset()
     while True:
         action_mask = env.get_action_mask()
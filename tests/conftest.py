@@ -0,0 +1,107 @@
+import os
+import random
+import sys
+
+import numpy as np
+
+# modules import each other from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.random_agent import RandomAgent
+from agents.sub_optimal_agent import SubOptimalAgent
+from agents.value_agent import ValueAgent
+from env import Action, ForSale, Player
+
+# agents and helpers shared by the engine tests, engines are compared by playing the same seeds
+
+# picks a legal action from what it reads in info['observation'], so any stale or wrong observation changes the game
+class ObservationAgent (Player):
+    def action(self, info):
+        actions = np.flatnonzero(info['action_mask'])
+        return int(actions[int(np.sum(info['observation'] * np.arange(1, len(info['observation']) + 1))) % len(actions)])
+
+# ForSale's buffer reordered with the seat's player data first, like server.seat_observation
+def seat_observation(env, seat):
+    board_len = len(env.obs_buffer) - sum(len(x) for x in env.obs_players)
+    players = [env.obs_players[(seat + i) % env.num_players] for i in range(env.num_players)]
+    return np.concatenate([env.obs_buffer[:board_len]] + players)
+
+# reads its observation like ObservationAgent, from its own seat's view of ForSale's buffer when given the env
+class SeatObservationAgent (ObservationAgent):
+    env = None
+
+    def action(self, info):
+        if self.env is not None:
+            info = dict(info, observation=seat_observation(self.env, self.num))
+        return super().action(info)
+
+AGENTS = {'r': RandomAgent, 'v': ValueAgent, 's': SubOptimalAgent, 'o': ObservationAgent}
+
+# agent letters cycled over n seats, the live seat gets a plain player
+def build(n, kinds, live=None):
+    return [Player(i) if i == live else AGENTS[kinds[i % len(kinds)]](i) for i in range(n)]
+
+def same_game(a, b):
+    assert a.action_log == b.action_log
+    assert [(x.coins, x.money) for x in a.players] == [(x.coins, x.money) for x in b.players]
+
+# random legal action and the odd illegal one, never past the last hand slot
+def pick_action(rng, mask, n):
+    if rng.random() > 0.02:
+        return int(rng.choice(np.flatnonzero(mask)))
+    return int(rng.integers(Action.SELL_1 + ForSale.NUM_CARDS[n] // n))
+
+# the live player plays pick_action until the game ends, the trace is everything it gets back
+def play(env, seed, n, vec=False):
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    observation = env.reset()[0] if vec else env.reset(seed=seed)
+    trace = [observation.tolist()]
+    while True:
+        mask = env.action_masks()[0] if vec else env.get_action_mask()
+        trace.append(mask.tolist())
+        action = pick_action(rng, mask, n)
+        if vec:
+            observation, reward, done, info = env.step(np.array([action]))
+            observation, reward, done = (info[0]['terminal_observation'] if done[0] else observation[0]), reward[0], done[0]
+        else:
+            observation, reward, done, _ = env.step(action)
+        trace.append((observation.tolist(), float(reward), bool(done)))
+        if done:
+            return trace
+
+# seven segment digits drawn dark on a light card, the size of the bga-bot digit boxes
+SEGMENTS = {
+    'top': (slice(2, 5), slice(3, 11)), 'middle': (slice(14, 17), slice(3, 11)), 'bottom': (slice(26, 29), slice(3, 11)),
+    'upper_left': (slice(2, 17), slice(2, 5)), 'upper_right': (slice(2, 17), slice(9, 12)),
+    'lower_left': (slice(14, 29), slice(2, 5)), 'lower_right': (slice(14, 29), slice(9, 12))
+}
+DIGIT_SEGMENTS = {
+    '0': ['top', 'upper_left', 'upper_right', 'lower_left', 'lower_right', 'bottom'],
+    '1': ['upper_right', 'lower_right'],
+    '2': ['top', 'upper_right', 'middle', 'lower_left', 'bottom'],
+    '3': ['top', 'upper_right', 'middle', 'lower_right', 'bottom'],
+    '4': ['upper_left', 'upper_right', 'middle', 'lower_right'],
+    '5': ['top', 'upper_left', 'middle', 'lower_right', 'bottom'],
+    '6': ['top', 'upper_left', 'middle', 'lower_left', 'lower_right', 'bottom'],
+    '7': ['top', 'upper_right', 'lower_right'],
+    '8': list(SEGMENTS),
+    '9': ['top', 'upper_left', 'upper_right', 'middle', 'lower_right', 'bottom']
+}
+
+# rgb crop of one digit box, '' is a blank slot
+def digit_crop(digit, shape=(31, 14)):
+    crop = np.full(shape + (3,), 235, dtype=np.uint8)
+    for segment in DIGIT_SEGMENTS.get(digit, []):
+        crop[SEGMENTS[segment]] = 20
+    return crop
+
+# rgb frame with the digit boxes filled in, cards are read as two boxes with single digit cards leaving the second blank
+def board_frame(cards, boxes, shape=(1070, 937)):
+    frame = np.full(shape + (3,), 235, dtype=np.uint8)
+    for i, card in enumerate(cards):
+        digits = str(card)
+        for j, digit in enumerate([digits[0], digits[1] if len(digits) > 1 else '']):
+            x1, y1, x2, y2 = boxes[2 * i + j]
+            frame[y1:y2, x1:x2] = digit_crop(digit, (y2 - y1, x2 - x1))
+    return frame
@@ -0,0 +1,61 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip('PIL')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bga-bot'))
+
+from capture import CaptureLoop
+from digits import DigitRecognizer
+from main import get_digit_boxes
+from tests.conftest import board_frame, digit_crop
+
+# synthetic frames played through the capture loop offline
+
+class ListSource ():
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    def next_frame(self):
+        return self.frames.pop(0) if self.frames else None
+
+def recognizer():
+    recognizer = DigitRecognizer()
+    recognizer.calibrate([(digit_crop(x), x) for x in '0123456789'])
+    return recognizer
+
+def test_only_changed_regions_are_read():
+    boxes = get_digit_boxes()
+    frames = [board_frame([3, 14, 25], boxes), board_frame([3, 14, 25], boxes), board_frame([3, 17, 25], boxes)]
+    events = []
+    loop = CaptureLoop(ListSource(frames), recognizer(), on_change=events.append)
+
+    loop.run(interval=0, max_frames=1)
+    assert loop.state == {'card_0': 3, 'card_1': 14, 'card_2': 25} and loop.reads == 3
+    assert [(x['region'], x['value'], x['previous']) for x in events] == [('card_0', 3, None), ('card_1', 14, None), ('card_2', 25, None)]
+
+    events.clear()
+    loop.run(interval=0, max_frames=2)
+    assert loop.reads == 3 and events == []
+
+    loop.run(interval=0)
+    assert loop.reads == 4
+    assert events == [{'region': 'card_1', 'value': 17, 'previous': 14, 'frame': 3}]
+
+# a card fading over frames changes too little between any two of them, it's caught against the crop last read
+# and read again until it stops changing
+def test_slow_fade_is_read():
+    boxes = get_digit_boxes()
+    before = board_frame([3, 14, 25], boxes).astype(np.float32)
+    after = board_frame([3, 14, 28], boxes).astype(np.float32)
+    frames = [before.astype(np.uint8)] + [(before + (after - before) * x / 20).astype(np.uint8) for x in range(1, 21)]
+    events = []
+    loop = CaptureLoop(ListSource(frames), recognizer(), on_change=events.append)
+    loop.run(interval=0)
+    assert loop.state['card_2'] == 28
+    assert {x['region'] for x in events[3:]} == {'card_2'} and events[-1]['value'] == 28
+    # read again only from when the change added up, not on every frame of the fade
+    assert loop.reads < 3 + len(frames) - 1
@@ -0,0 +1,57 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bga-bot'))
+
+from digits import DigitRecognizer
+from main import get_board_cards, get_digit_boxes, get_samples
+from tests.conftest import board_frame, digit_crop
+
+# the recognizer calibrated and checked offline on synthetic screenshots of known boards
+
+def screenshot(cards):
+    return Image.fromarray(board_frame(cards, get_digit_boxes()))
+
+# boards covering every digit, single digit cards leave their second box blank
+CALIBRATION_BOARDS = [[1, 23, 4], [5, 16, 7], [8, 9, 30]]
+
+def calibrated():
+    samples = []
+    for cards in CALIBRATION_BOARDS:
+        samples += get_samples(screenshot(cards), cards)
+    recognizer = DigitRecognizer()
+    recognizer.calibrate(samples)
+    return recognizer
+
+def test_read_boards():
+    recognizer = calibrated()
+    assert recognizer.digits == list('0123456789')
+    for cards in [[3, 14, 25], [2, 10, 29], [6, 17, 28]]:
+        assert get_board_cards(screenshot(cards), recognizer) == cards
+
+def test_blank_slots():
+    recognizer = calibrated()
+    assert recognizer.read([digit_crop(''), digit_crop('7'), digit_crop('')]) == ['', '7', '']
+    # an empty board slot reads as no card
+    frame = board_frame([3, 14, 25], get_digit_boxes())
+    x1, y1, x2, y2 = get_digit_boxes()[2]
+    frame[y1:y2, x1:x2 + 14] = 235
+    assert get_board_cards(Image.fromarray(frame), recognizer) == [3, None, 25]
+
+def test_save_load(tmp_path):
+    recognizer = calibrated()
+    path = str(tmp_path / 'templates.npz')
+    recognizer.save(path)
+    loaded = DigitRecognizer.load(path)
+    assert loaded.digits == recognizer.digits
+    assert np.array_equal(loaded.templates, recognizer.templates)
+    assert get_board_cards(screenshot([11, 20, 19]), loaded) == [11, 20, 19]
+
+def test_uncalibrated():
+    with pytest.raises(Exception):
+        DigitRecognizer().read([digit_crop('1')])
@@ -0,0 +1,45 @@
+import random
+
+import numpy as np
+import pytest
+
+from env import ForSale
+from fast_env import FastForSale
+from tests.conftest import build, pick_action
+
+# the scaled observation values come from ForSale's scale helpers in the single game engines and from its batch
+# encoders in VecForSale, all three have to agree on the same state
+
+# one game's observation through the batch encoders, player data from the live seat on
+def encode(env):
+    n = env.num_players
+    players = [env.players[(env.live_player + k) % n] for k in range(n)]
+    obs = np.zeros((1,) + env.observation_space.shape, dtype=env.observation_space.dtype)
+    board = np.array(env.board, dtype=float) if len(env.board) else np.zeros(n)
+    ForSale.encode_board(obs[:, :2 + n], n, np.array([int(env.stage)]), np.array([env.last_bid]), board[None])
+    player_len = ForSale.get_player_obs_len(n, env.obs_mode)
+    for k, player in enumerate(players):
+        start = 2 + n + k * player_len
+        ForSale.encode_player(obs[:, start:start + player_len], n, env.obs_mode, np.array([player.coins]), np.array([player.money]),
+                              np.array([player.is_bidding]), np.array([player.bid]), np.array([player.property]))
+    return obs[0]
+
+@pytest.mark.parametrize('obs_mode', ['norm', 'cards'])
+@pytest.mark.parametrize('n', [3, 4, 5, 6])
+def test_scaled_observations(n, obs_mode):
+    for seed in range(4):
+        live = seed % n
+        a = ForSale(build(n, 'vs', live), live_player=live, obs_mode=obs_mode)
+        b = FastForSale(build(n, 'vs', live), live_player=live, obs_mode=obs_mode)
+        random.seed(seed)
+        obs_a = a.reset(seed=seed)
+        obs_b = b.reset(seed=seed)
+        rng = np.random.default_rng(seed)
+        while True:
+            assert np.array_equal(obs_a, obs_b)
+            assert np.array_equal(obs_a, encode(a))
+            if a.is_game_over:
+                break
+            action = pick_action(rng, a.action_mask, n)
+            obs_a, _, _, _ = a.step(action)
+            obs_b, _, _, _ = b.step(action)
@@ -0,0 +1,68 @@
+import random
+
+import numpy as np
+import pytest
+
+from env import ForSale
+from fast_env import FastForSale
+from tests.conftest import SeatObservationAgent, build, pick_action, same_game
+
+# FastForSale has to play every game exactly like ForSale, same seeds give the same action logs, coins and money
+
+@pytest.mark.parametrize('obs_mode', ['raw', 'norm', 'cards'])
+@pytest.mark.parametrize('kinds', ['rrr', 'vvv', 'rv', 'svr', 'ooo', 'orv'])
+@pytest.mark.parametrize('n', [3, 4, 5, 6])
+def test_auto_play(n, kinds, obs_mode):
+    for seed in range(5):
+        a = ForSale(build(n, kinds), obs_mode=obs_mode)
+        b = FastForSale(build(n, kinds), obs_mode=obs_mode)
+        random.seed(seed)
+        a.reset(seed=seed)
+        random.seed(seed)
+        b.reset(seed=seed)
+        same_game(a, b)
+
+# a live player stepping random legal actions and the odd illegal one, opponents read their observations
+@pytest.mark.parametrize('obs_mode', ['raw', 'norm', 'cards'])
+@pytest.mark.parametrize('n', [3, 4, 5, 6])
+def test_live_player(n, obs_mode):
+    for seed in range(4):
+        live = seed % n
+        a = ForSale(build(n, 'ov', live), live_player=live, obs_mode=obs_mode)
+        b = FastForSale(build(n, 'ov', live), live_player=live, obs_mode=obs_mode)
+        assert a.observation_space == b.observation_space
+
+        random.seed(seed)
+        obs_a = a.reset(seed=seed)
+        random.seed(seed)
+        obs_b = b.reset(seed=seed)
+        rng = np.random.default_rng(seed)
+        while True:
+            assert obs_a.dtype == obs_b.dtype and (obs_a == obs_b).all()
+            for i in range(n):
+                assert (a.get_action_mask(i) == b.get_action_mask(i)).all()
+            assert a.get_state().snapshot() == b.get_state().snapshot()
+            if a.is_game_over:
+                break
+            action = pick_action(rng, a.action_mask, n)
+            state = random.getstate()
+            obs_a, reward_a, done_a, _ = a.step(action)
+            random.setstate(state)
+            obs_b, reward_b, done_b, _ = b.step(action)
+            assert reward_a == reward_b and done_a == done_b
+        same_game(a, b)
+
+@pytest.mark.parametrize('obs_mode', ['raw', 'norm', 'cards'])
+@pytest.mark.parametrize('n', [3, 4, 5, 6])
+def test_seat_observations(n, obs_mode):
+    for seed in range(5):
+        players_a = [SeatObservationAgent(i) for i in range(n)]
+        a = ForSale(players_a, obs_mode=obs_mode)
+        for player in players_a:
+            player.env = a
+        b = FastForSale([SeatObservationAgent(i) for i in range(n)], obs_mode=obs_mode, seat_observations=True)
+        random.seed(seed)
+        a.reset(seed=seed)
+        random.seed(seed)
+        b.reset(seed=seed)
+        same_game(a, b)
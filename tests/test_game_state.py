@@ -0,0 +1,32 @@
+import random
+
+from agents.random_agent import RandomAgent
+from env import ForSale, Stage
+from game_state import GameState
+
+# state of a random game partway into a sell round, after at least one player picked a card
+def sell_round_state(seed):
+    env = ForSale([RandomAgent(i) for i in range(4)], live_player=0)
+    env.reset(seed=seed)
+    state = GameState(env)
+    rng = random.Random(seed)
+    while not (state.stage == Stage.SELLING and state.num_sell_property > 0 and len(state.legal_actions()) > 1):
+        state.apply(rng.choice(state.legal_actions()), undoable=False)
+    return state
+
+def test_determinize_resamples_hidden_sell_picks():
+    for seed in range(10):
+        state = sell_round_state(seed)
+        player_num = state.curr_player % state.num_players
+        picked = [i for i in range(state.num_players) if state.sell_property[i] != -1]
+        rng = random.Random(seed)
+        samples = {i: set() for i in picked}
+        for _ in range(50):
+            game = state.determinize(rng)
+            assert game.curr_player == state.curr_player and game.num_sell_property == state.num_sell_property
+            assert game.sell_property[player_num] == -1
+            for i in picked:
+                assert game.property[i][game.sell_property[i]] != -1
+                samples[i].add(game.sell_property[i])
+        # with more than one card left the real pick can't be the only one searched
+        assert all(len(samples[i]) > 1 for i in picked)
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('sb3_contrib')
+
+import agents.rl_agent
+import league
+
+# stands in for a loaded model, plays the first legal action
+class FirstLegalModel ():
+    def predict(self, observation, action_masks=None):
+        return int(np.flatnonzero(action_masks)[0]), None
+
+@pytest.mark.parametrize('num_players', [3, 4, 5, 6])
+def test_evaluate_seat_observations(num_players, monkeypatch):
+    monkeypatch.setattr(agents.rl_agent, 'load_model', lambda algo, path : FirstLegalModel())
+    seats = {}
+    action = agents.rl_agent.RLModelAgent.action
+
+    # raw observations start the player data with the seat the view is from
+    def seat_action(self, info):
+        assert info['observation'][2 + num_players] == self.num
+        seats.setdefault(self.path, set()).add(self.num)
+        return action(self, info)
+
+    monkeypatch.setattr(agents.rl_agent.RLModelAgent, 'action', seat_action)
+    win_rate = league.evaluate('learner', 'ppo_mask', {'algo': 'ppo_mask', 'path': 'snapshot'}, num_players, 4)
+    assert 0 <= win_rate <= 1
+    assert seats == {'snapshot': set(range(num_players - 1)), 'learner': {num_players - 1}}
@@ -0,0 +1,60 @@
+import asyncio
+import socket
+import time
+
+import pytest
+
+pytest.importorskip('sb3_contrib')
+
+from agents.value_agent import ValueAgent
+from server import GameServer, LocalSeat, Table, play_remote
+
+# value agent that takes longer than the move timeout to answer
+class SlowAgent (ValueAgent):
+    def action(self, info):
+        time.sleep(0.05)
+        return super().action(info)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def test_local_tables():
+    server = GameServer(4, 'vrsv')
+    results = asyncio.run(server.run_local(2, 6))
+    server.close()
+    assert len(results) == 6 and server.games == 6
+    for winner, scores in results:
+        assert len(scores) == 4 and scores[winner] == max(scores)
+
+def test_remote_clients():
+    async def run():
+        port = free_port()
+        server = GameServer(3, 'v', move_timeout=5)
+        task = asyncio.get_running_loop().create_task(server.serve(port=port))
+        await asyncio.sleep(0.1)
+        results = await asyncio.gather(play_remote(ValueAgent(0), port=port, games=2), play_remote(ValueAgent(0), port=port, games=2))
+        task.cancel()
+        server.close()
+        return results
+
+    for results in asyncio.run(run()):
+        assert len(results) == 2
+        for result in results:
+            assert len(result['scores']) == 3 and result['scores'][result['winner']] == max(result['scores'])
+
+# a slow threaded seat times out every move while a table of quick agents plays on the same loop
+def test_move_timeout():
+    async def run():
+        slow_table = Table([LocalSeat(SlowAgent(0), threaded=True), LocalSeat(ValueAgent(1)), LocalSeat(ValueAgent(2))], move_timeout=0.01)
+        quick_table = Table([LocalSeat(ValueAgent(0)) for _ in range(3)])
+        slow_task = asyncio.get_running_loop().create_task(slow_table.play(seed=0))
+        await quick_table.play(seed=1)
+        # the quick table never waited on the slow agent's thread
+        assert not slow_task.done()
+        await slow_task
+        return slow_table
+
+    table = asyncio.run(run())
+    assert table.timeouts > 0 and table.illegal_actions == 0
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from agents.random_agent import RandomAgent
+from agents.value_agent import ValueAgent
+from env import Action, ForSale, Stage
+
+# batch_action has to decide exactly like action for every game in the batch
+
+# random agent that keeps a copy of every info it's given
+class RecordingAgent (RandomAgent):
+    def __init__(self, player_num, infos):
+        super().__init__(player_num)
+        self.infos = infos
+
+    def action(self, info):
+        self.infos.append(dict(info, board=np.array(info['board']), property=list(info['property']), action_mask=np.array(info['action_mask'])))
+        return super().action(info)
+
+def batch(agent, infos, stage):
+    boards = np.array([x['board'] for x in infos])
+    last_bids = np.array([x['last_bid'] for x in infos])
+    masks = np.array([x['action_mask'] for x in infos])
+    hands = np.array([x['property'] for x in infos])
+    return agent.batch_action(boards, last_bids, masks, hands, stage)
+
+@pytest.mark.parametrize('n', [3, 4, 5, 6])
+def test_batch_action(n):
+    infos = []
+    env = ForSale([RecordingAgent(i, infos) for i in range(n)])
+    for seed in range(30):
+        env.reset(seed=seed)
+
+    agent = ValueAgent(0)
+    actions = np.array([int(agent.action(x)) for x in infos])
+    stages = np.array([x['stage'] for x in infos])
+    assert (batch(agent, infos, stages) == actions).all()
+    # one stage for the whole batch
+    for stage in (Stage.BUYING, Stage.SELLING):
+        is_stage = stages == stage
+        assert (batch(agent, [x for x, y in zip(infos, is_stage) if y], stage) == actions[is_stage]).all()
+
+# the sell scan compares a slot's halved distance to the board but keeps its full distance, so with a board value of 5
+# slot 1 (distance 0 halved) is replaced by slot 2 (1 halved, beating slot 1's stored 5)
+def test_batch_action_sell_scan():
+    info = {
+        'stage': Stage.SELLING, 'num_players': 3, 'last_bid': 0, 'board': np.array([5, 5, 5]),
+        'property': [2, 10, 8], 'action_mask': np.array([0, 0, 0, 1, 1, 1, 0, 0, 0, 0, 0], dtype=bool)
+    }
+    agent = ValueAgent(0)
+    assert agent.action(info) == Action.SELL_1 + 2
+    assert batch(agent, [info], Stage.SELLING)[0] == Action.SELL_1 + 2
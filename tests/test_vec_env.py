@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('stable_baselines3')
+
+from env import ForSale
+from tests.conftest import build, pick_action, play
+from vec_env import VecForSale
+
+# a one game VecForSale has to play exactly like ForSale, same seeds give the same observations, masks and rewards
+
+@pytest.mark.parametrize('obs_mode', ['raw', 'norm', 'cards'])
+@pytest.mark.parametrize('n', [3, 4, 5, 6])
+def test_same_games(n, obs_mode):
+    for live in range(n):
+        for seed in range(4):
+            env = ForSale(build(n, 'vsro', live), live_player=live, obs_mode=obs_mode)
+            vec_env = VecForSale(build(n, 'vsro', live), live, num_envs=1, obs_mode=obs_mode)
+            vec_env.seed(seed)
+            assert play(env, seed, n) == play(vec_env, seed, n, vec=True)
+
+# every game of a batched VecForSale, game i seeded seed + i, has to play like its own ForSale
+# games drift apart in length, so opponents are batched over games at different stages and seats in the same step
+@pytest.mark.parametrize('obs_mode', ['raw', 'norm', 'cards'])
+@pytest.mark.parametrize('n', [3, 4, 5, 6])
+def test_same_games_batched(n, obs_mode, num_envs=6, seed=10):
+    for live in range(n):
+        vec_env = VecForSale(build(n, 'vvso', live), live, num_envs=num_envs, obs_mode=obs_mode)
+        vec_env.seed(seed)
+        rngs = [np.random.default_rng(seed + i) for i in range(num_envs)]
+        traces = [[x.tolist()] for x in vec_env.reset()]
+        is_done = [False] * num_envs
+        while not all(is_done):
+            masks = vec_env.action_masks()
+            actions = []
+            for i, mask in enumerate(masks):
+                # finished games restart, they just play on until every first game is over
+                if is_done[i]:
+                    actions.append(int(np.flatnonzero(mask)[0]))
+                else:
+                    traces[i].append(mask.tolist())
+                    actions.append(pick_action(rngs[i], mask, n))
+            observations, rewards, dones, infos = vec_env.step(np.array(actions))
+            for i in range(num_envs):
+                if not is_done[i]:
+                    observation = infos[i]['terminal_observation'] if dones[i] else observations[i]
+                    traces[i].append((observation.tolist(), float(rewards[i]), bool(dones[i])))
+                    is_done[i] = bool(dones[i])
+
+        for i in range(num_envs):
+            env = ForSale(build(n, 'vvso', live), live_player=live, obs_mode=obs_mode)
+            assert play(env, seed + i, n) == traces[i]
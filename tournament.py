@@ -0,0 +1,191 @@
+import argparse
+import math
+import multiprocessing as mp
+import random
+
+from agents.roster import build_players
+from fast_env import FastForSale
+
+# play seat rotated games between agents across a process pool and rate them with elo
+# agents are cpu letters (s, r, v, t, e) or model paths, empty seats are filled by the filler agent
+
+AGENT_LETTERS = 'srvte'
+
+# roster str and model paths for a lineup, e.g. ['v', './models/a'] is 'vm' with models ['./models/a']
+def lineup_to_roster(lineup):
+    agents = ''
+    models = []
+    for spec in lineup:
+        if len(spec) == 1 and spec in AGENT_LETTERS:
+            agents += spec
+        else:
+            agents += 'm'
+            models.append(spec)
+    return agents, models
+
+_worker = {}
+
+def _init_worker(specs, num_players, filler, seed):
+    _worker['lineup'] = list(specs) + [filler] * (num_players - len(specs))
+    _worker['num_players'] = num_players
+    _worker['seed'] = seed
+    _worker['envs'] = {}
+
+# env for one seat rotation, models are shared between rotations through the model registry
+# there's no live player so every model sees the game from its own seat
+def _get_env(rotation):
+    if rotation not in _worker['envs']:
+        lineup = _worker['lineup']
+        seats = [lineup[(i + rotation) % len(lineup)] for i in range(len(lineup))]
+        agents, models = lineup_to_roster(seats)
+        _worker['envs'][rotation] = FastForSale(build_players(agents, models), seat_observations=True)
+    return _worker['envs'][rotation]
+
+# play one full game and return the final (money + coins, coins) of each lineup slot
+def _play_game(game_num):
+    num_players = _worker['num_players']
+    rotation = game_num % num_players
+    seed = _worker['seed'] + game_num
+    random.seed(seed)
+    env = _get_env(rotation)
+    env.reset(seed=seed)
+
+    results = [None] * num_players
+    for seat, player in enumerate(env.players):
+        results[(seat + rotation) % num_players] = (player.coins + player.money, player.coins)
+    return results
+
+def elo_from_score(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+def score_from_elo(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+# win, draw, loss record of one agent against another, every game counts as one pairwise result
+class Record ():
+    def __init__(self):
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+
+    def add(self, result, other):
+        if result > other:
+            self.wins += 1
+        elif result < other:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def score(self):
+        return (self.wins + self.draws / 2) / max(self.games(), 1)
+
+    def variance(self):
+        n = max(self.games(), 1)
+        s = self.score()
+        return (self.wins * (1 - s) ** 2 + self.draws * (0.5 - s) ** 2 + self.losses * s ** 2) / n
+
+    # elo difference with a 95% confidence interval from the normal approximation of the score
+    def elo(self):
+        n = max(self.games(), 1)
+        s = self.score()
+        margin = 1.96 * math.sqrt(self.variance() / n)
+        return elo_from_score(s), elo_from_score(s - margin), elo_from_score(s + margin)
+
+    # generalized sprt log likelihood ratio of elo1 against elo0
+    def llr(self, elo0, elo1):
+        variance = self.variance()
+        if self.games() == 0 or variance == 0:
+            return 0
+        s0, s1 = score_from_elo(elo0), score_from_elo(elo1)
+        return self.games() * (s1 - s0) * (2 * self.score() - s0 - s1) / (2 * variance)
+
+class Tournament ():
+    def __init__(self, specs, num_players=3, filler='v', games=1000, workers=None, seed=0, elo0=0, elo1=20, alpha=0.05, beta=0.05):
+        if num_players < 3 or num_players > 6:
+            raise Exception('number of players must be 3-6')
+        if len(specs) < 2 or len(specs) > num_players:
+            raise Exception('need 2 to num_players agents')
+
+        self.specs = specs
+        self.num_players = num_players
+        self.filler = filler
+        self.games = games
+        self.workers = workers or mp.cpu_count()
+        self.seed = seed
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.num_games = 0
+        self.records = [[Record() for _ in specs] for _ in specs]
+        self.decision = None
+
+    def add_results(self, results):
+        self.num_games += 1
+        for i in range(len(self.specs)):
+            for j in range(len(self.specs)):
+                if i != j:
+                    self.records[i][j].add(results[i], results[j])
+
+    # only a two agent match has a sequential test, H0 elo0 against H1 elo1 for the first agent
+    def check_sprt(self):
+        if len(self.specs) != 2:
+            return None
+        llr = self.records[0][1].llr(self.elo0, self.elo1)
+        if llr >= self.upper:
+            self.decision = 'H1'
+        elif llr <= self.lower:
+            self.decision = 'H0'
+        return self.decision
+
+    # pooled record of each agent against the rest of the field
+    def field_record(self, i):
+        record = Record()
+        for j, other in enumerate(self.records[i]):
+            if i != j:
+                record.wins += other.wins
+                record.draws += other.draws
+                record.losses += other.losses
+        return record
+
+    def run(self, report_every=200):
+        initargs = (self.specs, self.num_players, self.filler, self.seed)
+        with mp.Pool(self.workers, initializer=_init_worker, initargs=initargs) as pool:
+            for results in pool.imap_unordered(_play_game, range(self.games), chunksize=8):
+                self.add_results(results)
+                if self.check_sprt():
+                    pool.terminate()
+                    break
+                if self.num_games % report_every == 0:
+                    self.report()
+        self.report()
+        return self.decision
+
+    def report(self):
+        print('Games: {}'.format(self.num_games))
+        for i, spec in enumerate(self.specs):
+            elo, low, high = self.field_record(i).elo()
+            print('  {} | score {:.3f} | elo vs field {:+.1f} ({:+.1f}, {:+.1f})'.format(spec, self.field_record(i).score(), elo, low, high))
+        if len(self.specs) == 2:
+            print('  LLR {:.2f} ({:.2f}, {:.2f}) elo0 {} elo1 {} | decision {}'.format(
+                self.records[0][1].llr(self.elo0, self.elo1), self.lower, self.upper, self.elo0, self.elo1, self.decision))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='tournament arguments')
+    parser.add_argument('--agents', nargs='+', required=True)
+    parser.add_argument('--num_players', type=int, default=3)
+    parser.add_argument('--filler', default='v', choices=list(AGENT_LETTERS))
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--elo0', type=float, default=0)
+    parser.add_argument('--elo1', type=float, default=20)
+
+    args = parser.parse_args().__dict__
+    tournament = Tournament(args['agents'], num_players=args['num_players'], filler=args['filler'], games=args['games'],
+                            workers=args['workers'], seed=args['seed'], elo0=args['elo0'], elo1=args['elo1'])
+    tournament.run()
@@ -1,55 +1,76 @@
 import datetime
 import argparse
+import json
+import os
 
 import numpy as np
 import gym
 from stable_baselines3 import PPO, DQN
 from stable_baselines3.common.env_util import make_vec_env
+from stable_baselines3.common.vec_env import VecMonitor
 from sb3_contrib.common.maskable.policies import MaskableActorCriticPolicy
 from sb3_contrib.common.wrappers import ActionMasker
 from sb3_contrib.ppo_mask import MaskablePPO
 
-from agents.sub_optimal_agent import SubOptimalAgent
-from agents.random_agent import RandomAgent
-from agents.rl_agent import RLModelAgent, RLTrainingAgent
-from agents.value_agent import ValueAgent
+from agents.rl_agent import RLTrainingAgent
+from agents.roster import build_players
+from checkpoints import CheckpointCallback, load_checkpoint
+from league import LeagueCallback
+from profiling import EnvProfileCallback
+from subproc_env import SubprocForSale
+from sweep import Sweep
+from vec_env import VecForSale
 
 np.random.seed(123)
 ENV_NAME = 'ForSale-v0'
 gym.envs.registration.register(id=ENV_NAME, entry_point='env:ForSale')
 
 class ModelTrainer:
-    def __init__(self, num_players=3, agents='ss', seed=123, steps=1e6, models=[]):
+    def __init__(self, num_players=3, agents='ss', seed=123, steps=1e6, models=[], num_envs=8, vec='dummy', shared_inference=False, profile=False,
+                 league=None, snapshot_freq=100000, eval_games=50, checkpoint_freq=100000, eval_rosters=None, resume=None, obs_mode='raw'):
         self.num_players = num_players
         self.agents = agents
         self.seed = seed
         self.steps = steps
+        self.models = models
+        self.num_envs = num_envs
+        self.vec = vec
+        self.shared_inference = shared_inference
+        self.profile = profile
+        self.league = league
+        self.snapshot_freq = snapshot_freq
+        self.eval_games = eval_games
+        self.checkpoint_freq = checkpoint_freq
+        self.eval_rosters = ['v' * (num_players - 1), 'r' * (num_players - 1)] if eval_rosters is None else eval_rosters
+        self.resume = resume
+        self.obs_mode = obs_mode
+        self.algo = None
         self.model_name = None
+        self.checkpoint_dir = None
         
-        self.players = []
-        player_num = 0
-        m_count = 0
-        for agent in agents:
-            if agent == 's':
-                self.players.append(SubOptimalAgent(player_num))
-            elif agent == 'r':
-                self.players.append(RandomAgent(player_num))
-            elif agent == 'v':
-                self.players.append(ValueAgent(player_num))
-            elif agent == 'm':
-                self.players.append(RLModelAgent(player_num, algo='ppo_mask', path=models[m_count]))
-                m_count += 1
-            player_num += 1
+        self.players = build_players(agents, models, league=league)
+        player_num = len(self.players)
         self.players.append(RLTrainingAgent(player_num))
 
         self.env_kwargs = {
             'players': self.players,
-            'live_player': player_num
+            'live_player': player_num,
+            'obs_mode': obs_mode
         }
+        self.vec_env_kwargs = dict(self.env_kwargs)
+        if profile:
+            self.env_kwargs['profile'] = True
 
     def run(self, algo='ppo_mask'):
-        time_str = datetime.datetime.now().strftime('%y.%m.%d_%H.%M.%S')
-        self.model_name = '{}_{}_{}_{}_{}'.format(algo, str(self.num_players), self.agents, str(self.steps), time_str)
+        self.algo = algo
+        if self.resume:
+            # a resumed run keeps its name so models and tensorboard logs carry on where it stopped
+            self.model_name = os.path.basename(os.path.normpath(self.resume))
+            self.checkpoint_dir = self.resume
+        else:
+            time_str = datetime.datetime.now().strftime('%y.%m.%d_%H.%M.%S')
+            self.model_name = '{}_{}_{}_{}_{}'.format(algo, str(self.num_players), self.agents, str(self.steps), time_str)
+            self.checkpoint_dir = './checkpoints/{}/{}'.format(algo, self.model_name)
 
         if algo == 'ppo':
             self.ppo_model()
@@ -57,14 +78,47 @@ class ModelTrainer:
             self.dqn_model()
         elif algo == 'ppo_mask':
             self.ppo_mask_model()
+        elif algo == 'ppo_mask_vec':
+            self.ppo_mask_vec_model()
+
+    def callbacks(self):
+        callbacks = [EnvProfileCallback()] if self.profile else []
+        # snapshots and checkpoints are loaded back as agents, both maskable variants save a MaskablePPO
+        algo = 'ppo_mask' if self.algo.startswith('ppo_mask') else self.algo
+        if self.league:
+            callbacks.append(LeagueCallback(self.league, self.num_players, algo=algo, snapshot_freq=self.snapshot_freq, eval_games=self.eval_games,
+                                            obs_mode=self.obs_mode))
+        if self.checkpoint_freq > 0:
+            callbacks.append(CheckpointCallback(self.checkpoint_dir, algo=algo, checkpoint_freq=self.checkpoint_freq, rosters=self.eval_rosters,
+                                                eval_games=self.eval_games, seed=self.seed, obs_mode=self.obs_mode))
+        return callbacks
+
+    # new model, or the latest checkpoint of the run when resuming
+    def get_model(self, algo_class, policy, env, tensorboard_log):
+        if self.resume:
+            return load_checkpoint(algo_class, self.checkpoint_dir, env, self.seed)
+        return algo_class(policy, env, seed=self.seed, verbose=0, tensorboard_log=tensorboard_log)
+
+    # resumed models only train the steps left and keep logging to their tensorboard run
+    def learn(self, model):
+        model.learn(total_timesteps=self.steps - model.num_timesteps, callback=self.callbacks(), reset_num_timesteps=not self.resume)
+
+    # one game per worker process, each worker builds its own roster from the agents str
+    def subproc_env(self):
+        env = SubprocForSale(self.agents, self.models, num_envs=self.num_envs, shared_inference=self.shared_inference, league=self.league, obs_mode=self.obs_mode)
+        env.seed(self.seed)
+        return VecMonitor(env)
 
     # PPO
     def ppo_model(self):
-        env = make_vec_env(ENV_NAME, env_kwargs=self.env_kwargs)
-        env.env_method('reset', seed=self.seed)
-
-        model = PPO('MlpPolicy', env, seed=self.seed, verbose=0, tensorboard_log='./tensorboard/ppo/' + self.model_name)
-        model.learn(total_timesteps=self.steps)
+        if self.vec == 'subproc':
+            env = self.subproc_env()
+        else:
+            env = make_vec_env(ENV_NAME, env_kwargs=self.env_kwargs)
+            env.env_method('reset', seed=self.seed)
+
+        model = self.get_model(PPO, 'MlpPolicy', env, './tensorboard/ppo/' + self.model_name)
+        self.learn(model)
         model.save('./models/ppo/' + self.model_name)
 
     # DQN 
@@ -72,8 +126,8 @@ class ModelTrainer:
         env = gym.make(ENV_NAME, **self.env_kwargs)
         env.reset(seed=self.seed)
 
-        model = DQN('MlpPolicy', env, seed=self.seed, verbose=0, tensorboard_log='./tensorboard/dqn/' + self.model_name)
-        model.learn(total_timesteps=self.steps)
+        model = self.get_model(DQN, 'MlpPolicy', env, './tensorboard/dqn/' + self.model_name)
+        self.learn(model)
         model.save('./models/dqn/' + self.model_name)
 
     # PPO maskable
@@ -81,26 +135,64 @@ class ModelTrainer:
         def mask_fn(env: gym.Env) -> np.ndarray:
             return env.get_action_mask()
 
-        env = gym.make(ENV_NAME, **self.env_kwargs)
-        env = ActionMasker(env, mask_fn)
-        env.reset(seed=self.seed)
+        if self.vec == 'subproc':
+            env = self.subproc_env()
+        else:
+            env = gym.make(ENV_NAME, **self.env_kwargs)
+            env = ActionMasker(env, mask_fn)
+            env.reset(seed=self.seed)
 
-        model = MaskablePPO(MaskableActorCriticPolicy, env, seed=self.seed, verbose=0, tensorboard_log='./tensorboard/ppo_mask/' + self.model_name)
-        model.learn(total_timesteps=self.steps)
+        model = self.get_model(MaskablePPO, MaskableActorCriticPolicy, env, './tensorboard/ppo_mask/' + self.model_name)
+        self.learn(model)
         model.save('./models/ppo_mask/' + self.model_name)
 
+    # PPO maskable on the batched engine, all games share the opponent agents
+    def ppo_mask_vec_model(self):
+        env = VecForSale(num_envs=self.num_envs, **self.vec_env_kwargs)
+        env.seed(self.seed)
+        env = VecMonitor(env)
+
+        model = self.get_model(MaskablePPO, MaskableActorCriticPolicy, env, './tensorboard/ppo_mask_vec/' + self.model_name)
+        self.learn(model)
+        model.save('./models/ppo_mask_vec/' + self.model_name)
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='model trainer arguments')
     parser.add_argument('--num_players', type=int, default=3)
     parser.add_argument('--agents', default='ss')
     parser.add_argument('--steps', type=int, default=2e6)
     parser.add_argument('--models', nargs='*', default=[])
+    parser.add_argument('--algo', default='ppo_mask', choices=['ppo', 'dqn', 'ppo_mask', 'ppo_mask_vec'])
+    parser.add_argument('--num_envs', type=int, default=8)
+    parser.add_argument('--vec', default='dummy', choices=['dummy', 'subproc'])
+    parser.add_argument('--shared_inference', action='store_true')
+    parser.add_argument('--profile', action='store_true')
+    parser.add_argument('--league', default=None)
+    parser.add_argument('--snapshot_freq', type=int, default=100000)
+    parser.add_argument('--eval_games', type=int, default=50)
+    parser.add_argument('--checkpoint_freq', type=int, default=100000)
+    parser.add_argument('--eval_rosters', nargs='*', default=None)
+    parser.add_argument('--resume', default=None)
+    parser.add_argument('--obs_mode', default='raw', choices=['raw', 'norm', 'cards'])
+    parser.add_argument('--sweep', default=None)
+    parser.add_argument('--sweep_dir', default='./sweeps/')
+    parser.add_argument('--trials', type=int, default=16)
+    parser.add_argument('--min_steps', type=int, default=50000)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cores', type=int, default=1)
 
     args = parser.parse_args().__dict__
     num_players = args['num_players']
     agents = args['agents']
     steps = args['steps']
     models = args['models']
+    algo = args['algo']
+    num_envs = args['num_envs']
+    vec = args['vec']
+    shared_inference = args['shared_inference']
+    profile = args['profile']
+    league = args['league']
 
     if len(agents) != num_players - 1:
         raise Exception('must have agents equal to num_players - 1')
@@ -108,5 +200,31 @@ if __name__ == '__main__':
     if agents.count('m') != len(models):
         raise Exception('must have models equal to amount of model agents')
 
-    mt = ModelTrainer(num_players=num_players, agents=agents, steps=steps, models=models)
-    mt.run()
+    if 'l' in agents and not league:
+        raise Exception('league agents need a league dir')
+
+    if 'l' in agents and algo == 'ppo_mask_vec':
+        raise Exception('league agents change between games, ppo_mask_vec needs ppo_mask or subproc')
+
+    if ('t' in agents or 'e' in agents) and algo == 'ppo_mask_vec':
+        raise Exception('mcts and sell solver agents need the game state, ppo_mask_vec needs ppo_mask or subproc')
+
+    if args['eval_rosters'] and any(len(x) != num_players - 1 or not set(x) <= set('srvte') for x in args['eval_rosters']):
+        raise Exception('eval rosters must be num_players - 1 cpu agents')
+
+    if args['sweep']:
+        if 'm' in agents or 'l' in agents:
+            raise Exception('sweeps train against cpu agents only')
+        with open(args['sweep']) as f:
+            space = json.load(f)
+        time_str = datetime.datetime.now().strftime('%y.%m.%d_%H.%M.%S')
+        out = os.path.join(args['sweep_dir'], '{}_{}_{}'.format(num_players, agents, time_str))
+        sweep = Sweep(space, out, num_players=num_players, agents=agents, num_trials=args['trials'], min_steps=args['min_steps'], eta=args['eta'],
+                      eval_rosters=args['eval_rosters'], eval_games=args['eval_games'], workers=args['workers'], cores=args['cores'],
+                      obs_mode=args['obs_mode'])
+        sweep.run()
+    else:
+        mt = ModelTrainer(num_players=num_players, agents=agents, steps=steps, models=models, num_envs=num_envs, vec=vec, shared_inference=shared_inference, profile=profile,
+                          league=league, snapshot_freq=args['snapshot_freq'], eval_games=args['eval_games'], checkpoint_freq=args['checkpoint_freq'],
+                          eval_rosters=args['eval_rosters'], resume=args['resume'], obs_mode=args['obs_mode'])
+        mt.run(algo=algo)
@@ -0,0 +1,354 @@
+import gym
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+
+from env import Action, Stage, ForSale
+
+# batched version of ForSale, holds num_envs games as arrays and resolves every game's action at once
+# rules are identical to ForSale, opponents still act through the same agent.action(info) interface
+class VecForSale (VecEnv):
+    NUM_DECK_CARDS = 30
+
+    def __init__(self, players, live_player, num_envs=8, obs_mode='raw'):
+        num_players = len(players)
+        if num_players < 3 or num_players > 6:
+            raise Exception('number of players must be 3-6')
+        if live_player < 0 or live_player >= num_players:
+            raise Exception('vec env requires a live player')
+        if obs_mode not in ForSale.OBS_MODES:
+            raise Exception('obs mode must be one of {}'.format(', '.join(ForSale.OBS_MODES)))
+
+        self.players = players
+        self.num_players = num_players
+        self.live_player = live_player
+        self.obs_mode = obs_mode
+        self.num_cards = ForSale.NUM_CARDS[num_players]
+        self.cards_per_player = self.num_cards // num_players
+        # live player first then the rest, same as ForSale observations
+        self.seats = (live_player + np.arange(num_players)) % num_players
+
+        super().__init__(num_envs, ForSale.get_observation_space(num_players, obs_mode), gym.spaces.Discrete(len(Action)))
+
+        n, p, c = num_envs, num_players, self.cards_per_player
+        self.games = np.arange(n)
+        self.rngs = [np.random.default_rng() for _ in range(n)]
+
+        # decks are kept whole and dealt by cursor, cursor starts past the cards removed for the game size
+        self.property_cards = np.zeros((n, self.NUM_DECK_CARDS), dtype=int)
+        self.money_cards = np.zeros((n, self.NUM_DECK_CARDS), dtype=int)
+        self.property_cursor = np.zeros(n, dtype=int)
+        self.money_cursor = np.zeros(n, dtype=int)
+
+        # player state
+        self.coins = np.zeros((n, p), dtype=int)
+        self.money = np.zeros((n, p), dtype=int)
+        self.bid = np.zeros((n, p), dtype=int)
+        self.is_bidding = np.ones((n, p), dtype=bool)
+        self.sell_property = np.full((n, p), -1, dtype=int)
+        self.property = np.full((n, p, c), -1, dtype=int)
+
+        # board state
+        self.board = np.zeros((n, p), dtype=int)
+        self.stage = np.zeros(n, dtype=int)
+        self.curr_player = np.zeros(n, dtype=int)
+        self.last_bid = np.zeros(n, dtype=int)
+        self.num_buy_round = np.zeros(n, dtype=int)
+        self.num_buy_property = np.zeros(n, dtype=int)
+        self.num_sell_round = np.zeros(n, dtype=int)
+        self.num_sell_property = np.zeros(n, dtype=int)
+        self.is_game_over = np.zeros(n, dtype=bool)
+        self.rewards = np.zeros(n, dtype=np.float32)
+        self.actions = None
+
+    def seed(self, seed=None):
+        if seed is None:
+            self.rngs = [np.random.default_rng() for _ in range(self.num_envs)]
+            return [None] * self.num_envs
+
+        self.rngs = [np.random.default_rng(seed + i) for i in range(self.num_envs)]
+        return [seed + i for i in range(self.num_envs)]
+
+    def reset(self):
+        self._reset_games(self.games)
+        return self._get_observations(self.games)
+
+    def step_async(self, actions):
+        self.actions = np.asarray(actions, dtype=int).reshape(self.num_envs)
+
+    # live player acts in every game, then all opponents are played until it's the live player's turn again
+    def step_wait(self):
+        self.rewards[:] = 0
+        self._execute_actions(self.games, self.actions)
+        self._auto_play(self.games)
+
+        obs = self._get_observations(self.games)
+        rewards = self.rewards.copy()
+        dones = self.is_game_over.copy()
+        infos = [{} for _ in range(self.num_envs)]
+
+        # finished games report their last observation and restart immediately
+        done_games = np.flatnonzero(dones)
+        if len(done_games) > 0:
+            for g in done_games:
+                infos[g]['terminal_observation'] = obs[g].copy()
+            self._reset_games(done_games)
+            obs[done_games] = self._get_observations(done_games)
+
+        return obs, rewards, dones, infos
+
+    def close(self):
+        pass
+
+    def action_masks(self):
+        return self._get_action_masks(self.games, np.full(self.num_envs, self.live_player))
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name)] * len(self._get_indices(indices))
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        indices = list(self._get_indices(indices))
+        if method_name == 'action_masks':
+            # sb3 contrib stacks per env masks, answer them all from one batched lookup
+            return list(self.action_masks()[indices])
+
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result] * len(indices)
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False] * len(self._get_indices(indices))
+
+    def _reset_games(self, games):
+        p = self.num_players
+        start = self.NUM_DECK_CARDS - self.num_cards
+        self.property_cards[games] = np.arange(1, 31)
+        self.money_cards[games] = np.sort(np.concatenate([[0, 0], np.arange(2, 16), np.arange(2, 16)]))
+        for g in games:
+            # same draw order as ForSale.reset so a seed deals the same game
+            rng = self.rngs[g]
+            rng.shuffle(self.property_cards[g])
+            rng.shuffle(self.money_cards[g])
+            self.curr_player[g] = rng.integers(p)
+
+        self.property_cursor[games] = start
+        self.money_cursor[games] = start
+
+        self.coins[games] = ForSale.NUM_COINS[p]
+        self.money[games] = 0
+        self.bid[games] = 0
+        self.is_bidding[games] = True
+        self.sell_property[games] = -1
+        self.property[games] = -1
+
+        self.stage[games] = Stage.BUYING
+        self.last_bid[games] = 0
+        self.num_buy_round[games] = 0
+        self.num_buy_property[games] = 0
+        self.num_sell_round[games] = 0
+        self.num_sell_property[games] = 0
+        self.is_game_over[games] = False
+        self._deal_next_cards(games)
+
+        # autoplay in case first player isn't the live player
+        self._auto_play(games)
+
+    # execute opponent actions until every game is waiting on the live player or finished
+    def _auto_play(self, games):
+        while True:
+            games = games[~self.is_game_over[games] & (self.curr_player[games] != self.live_player)]
+            if len(games) == 0:
+                break
+
+            # agents with batch_action decide for all their games at once, others get one info dict per game
+            actions = np.empty(len(games), dtype=int)
+            players = self.curr_player[games]
+            for player_num in np.unique(players):
+                is_player = players == player_num
+                player_games = games[is_player]
+                player = self.players[player_num]
+                if getattr(player, 'batch_action', None) is not None:
+                    action_masks = self._get_action_masks(player_games, players[is_player])
+                    actions[is_player] = player.batch_action(self.board[player_games], self.last_bid[player_games], action_masks,
+                                                             self.property[player_games, player_num], self.stage[player_games])
+                else:
+                    actions[is_player] = [int(np.asarray(player.action(self._get_info(g))).reshape(-1)[0]) for g in player_games]
+            self._execute_actions(games, actions)
+
+    def _execute_actions(self, games, actions):
+        buying = self.stage[games] == Stage.BUYING
+        self._resolve_buy_actions(games[buying], actions[buying])
+        self._resolve_sell_actions(games[~buying], actions[~buying])
+
+    # deal next set of cards to the board of each game, always sorted
+    def _deal_next_cards(self, games):
+        offsets = np.arange(self.num_players)
+        buying = self.stage[games] == Stage.BUYING
+        for cards, cursor, deal_games in ((self.property_cards, self.property_cursor, games[buying]), (self.money_cards, self.money_cursor, games[~buying])):
+            cols = cursor[deal_games, None] + offsets
+            self.board[deal_games] = np.sort(cards[deal_games[:, None], cols], axis=1)
+            cursor[deal_games] += self.num_players
+
+    # first seat after the current player that passes the check, per game
+    def _next_player(self, games, is_waiting):
+        seats = (self.curr_player[games, None] + np.arange(1, self.num_players + 1)) % self.num_players
+        waiting = is_waiting[games[:, None], seats]
+        return seats[np.arange(len(games)), waiting.argmax(axis=1)]
+
+    def _is_last_card(self, games):
+        return self.num_buy_property[games] == self.num_players - 1
+
+    def _resolve_illegal_actions(self, games):
+        games = games[self.curr_player[games] == self.live_player]
+        self.rewards[games] = -1
+        self.is_game_over[games] = True
+
+    def _resolve_buy_actions(self, games, actions):
+        if len(games) == 0:
+            return
+
+        players = self.curr_player[games]
+        is_last_card = self._is_last_card(games)
+        is_take = actions == Action.TAKE
+        is_bid = (actions >= Action.BID_1) & (actions <= Action.BID_2)
+        is_bid &= ~is_last_card & (self.last_bid[games] + actions <= self.coins[games, players])
+        self._resolve_illegal_actions(games[~(is_take | is_bid)])
+
+        # pay full bid if last card else pay half rounded up, then take lowest card on the board
+        take_games = games[is_take]
+        take_players = players[is_take]
+        bids = self.bid[take_games, take_players]
+        self.coins[take_games, take_players] -= np.where(is_last_card[is_take], bids, (bids + 1) // 2)
+        self.bid[take_games, take_players] = 0
+        self.is_bidding[take_games, take_players] = False
+        self.property[take_games, take_players, self.num_buy_round[take_games]] = self.board[take_games, self.num_buy_property[take_games]]
+        self.num_buy_property[take_games] += 1
+
+        bid_games = games[is_bid]
+        self.last_bid[bid_games] += actions[is_bid]
+        self.bid[bid_games, players[is_bid]] = self.last_bid[bid_games]
+
+        games = games[is_take | is_bid]
+        is_round_over = self.num_buy_property[games] == self.num_players
+
+        # check for next stage or next round, last person to take starts next buy round
+        round_games = games[is_round_over]
+        is_selling = self.property_cursor[round_games] == self.NUM_DECK_CARDS
+        sell_games = round_games[is_selling]
+        self.stage[sell_games] = Stage.SELLING
+        self.curr_player[sell_games] = self.live_player
+        self.property[sell_games] = np.sort(self.property[sell_games], axis=2)
+        next_games = round_games[~is_selling]
+        self.num_buy_round[next_games] += 1
+        self.is_bidding[next_games] = True
+        self.num_buy_property[round_games] = 0
+        self.last_bid[round_games] = 0
+        self._deal_next_cards(round_games)
+
+        # cycle to next active player in round
+        cycle_games = games[~is_round_over]
+        self.curr_player[cycle_games] = self._next_player(cycle_games, self.is_bidding)
+
+    def _resolve_sell_actions(self, games, actions):
+        if len(games) == 0:
+            return
+
+        players = self.curr_player[games]
+        sell_index = actions - Action.SELL_1
+        is_sell = (sell_index >= 0) & (sell_index < self.cards_per_player)
+        is_sell[is_sell] = self.property[games[is_sell], players[is_sell], sell_index[is_sell]] != -1
+        self._resolve_illegal_actions(games[~is_sell])
+
+        games = games[is_sell]
+        self.sell_property[games, players[is_sell]] = sell_index[is_sell]
+        self.num_sell_property[games] += 1
+        is_round_over = self.num_sell_property[games] == self.num_players
+
+        # all cards have been selected, lowest card gets lowest money
+        round_games = games[is_round_over]
+        rows = round_games[:, None]
+        seats = np.arange(self.num_players)
+        selected_cards = self.property[rows, seats, self.sell_property[round_games]]
+        self.property[rows, seats, self.sell_property[round_games]] = -1
+        self.sell_property[round_games] = -1
+        ranks = np.argsort(selected_cards, axis=1)
+        self.money[rows, ranks] += self.board[round_games]
+
+        self.num_sell_round[round_games] += 1
+        self.num_sell_property[round_games] = 0
+        self.curr_player[round_games] = self.live_player
+
+        is_over = self.money_cursor[round_games] == self.NUM_DECK_CARDS
+        over_games = round_games[is_over]
+        self.is_game_over[over_games] = True
+        self.board[over_games] = 0
+        # winner has most money, tiebreaker is leftover coins, later seat wins exact ties like ForSale's stable sort
+        total = self.coins[over_games] + self.money[over_games]
+        score = total * 1000 + self.coins[over_games]
+        winners = self.num_players - 1 - np.argmax(score[:, ::-1], axis=1)
+        self.rewards[over_games] = np.where(winners == self.live_player, 1, -1)
+        self._deal_next_cards(round_games[~is_over])
+
+        # cycle to next player for card selection
+        cycle_games = games[~is_round_over]
+        self.curr_player[cycle_games] = self._next_player(cycle_games, self.sell_property == -1)
+
+    def _get_observations(self, games):
+        n, p = len(games), self.num_players
+        rows = games[:, None]
+        obs = np.empty((n, self.observation_space.shape[0]), dtype=self.observation_space.dtype)
+        if self.obs_mode != 'raw':
+            # finished games have a zero board so their slots stay zeros when scaled
+            ForSale.encode_board(obs[:, :2 + p], p, self.stage[games], self.last_bid[games], self.board[games])
+            player_obs = obs[:, 2 + p:].reshape(n, p, -1)
+            ForSale.encode_player(player_obs, p, self.obs_mode, self.coins[rows, self.seats], self.money[rows, self.seats],
+                                  self.is_bidding[rows, self.seats], self.bid[rows, self.seats], self.property[rows, self.seats])
+            return obs
+
+        obs[:, 0] = self.stage[games]
+        obs[:, 1] = self.last_bid[games]
+        # finished games keep their board slots as zeros, same as ForSale
+        obs[:, 2:2 + p] = self.board[games]
+
+        player_obs = np.empty((n, p, 5 + self.cards_per_player), dtype=int)
+        player_obs[:, :, 0] = self.seats
+        player_obs[:, :, 1] = self.coins[rows, self.seats]
+        player_obs[:, :, 2] = self.money[rows, self.seats]
+        player_obs[:, :, 3] = self.is_bidding[rows, self.seats]
+        player_obs[:, :, 4] = self.bid[rows, self.seats]
+        player_obs[:, :, 5:] = self.property[rows, self.seats]
+        obs[:, 2 + p:] = player_obs.reshape(n, -1)
+        return obs
+
+    # info dict of a single game for the current player, same keys as ForSale
+    def _get_info(self, game):
+        player_num = self.curr_player[game]
+        games = np.array([game])
+        return {
+            'stage': Stage(self.stage[game]),
+            'last_bid': int(self.last_bid[game]),
+            'num_buy_property': int(self.num_buy_property[game]),
+            'num_sell_round': int(self.num_sell_round[game]),
+            'num_players': self.num_players,
+            'observation': self._get_observations(games)[0],
+            'action_mask': self._get_action_masks(games, np.array([player_num]))[0],
+            'board': self.board[game],
+            'property': self.property[game, player_num].tolist()
+        }
+
+    def _get_action_masks(self, games, player_nums):
+        action_masks = np.zeros((len(games), len(Action)), dtype=bool)
+        buying = self.stage[games] == Stage.BUYING
+
+        buy_games = games[buying]
+        coins = self.coins[buy_games, player_nums[buying]]
+        can_bid = ~self._is_last_card(buy_games)
+        action_masks[buying, Action.TAKE] = True
+        action_masks[buying, Action.BID_1] = can_bid & (self.last_bid[buy_games] + 1 <= coins)
+        action_masks[buying, Action.BID_2] = can_bid & (self.last_bid[buy_games] + 2 <= coins)
+
+        sell_games = games[~buying]
+        cards = Action.SELL_1 + self.cards_per_player
+        action_masks[~buying, Action.SELL_1:cards] = self.property[sell_games, player_nums[~buying]] != -1
+        return action_masks